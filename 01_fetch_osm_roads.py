@@ -41,6 +41,12 @@ Parameters
 --output:
     Path where the resulting GeoJSON should be written.  Intermediate
     directories will be created automatically.
+--format:
+    ``geojson`` (default), ``ndjson`` or ``fgb``.  ``fgb`` writes a binary
+    FlatGeobuf file with a spatial index and requires ``pyogrio``.
+--ndjson:
+    Write newline-delimited GeoJSON (one Feature per line) instead of a
+    single FeatureCollection document.  Same as ``--format ndjson``.
 
 Limitations
 -----------
@@ -52,13 +58,26 @@ configuring your own Overpass instance for offline operation.
 """
 
 import argparse
-import json
 import os
+import re
+from itertools import chain
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import ijson
+except ImportError:  # optional dependency
+    ijson = None
 
-import requests
 from natura.cache import DiskCache
+from natura.http import build_session
+from natura.io import OUTPUT_FORMATS, ensure_dir, loads, write_features
+
+# One keep-alive session for all Overpass calls; retries 429/5xx responses
+# with exponential backoff (Overpass rate limits aggressively).  Overpass
+# JSON compresses very well, so ask for gzip explicitly; streamed responses
+# are then decompressed chunk by chunk while they are parsed.
+_SESSION = build_session(retries=5, backoff_factor=2.0, headers={"Accept-Encoding": "gzip"})
 
 
 def build_overpass_query(lat: float, lon: float, radius: int, highways: List[str]) -> str:
@@ -81,14 +100,12 @@ def build_overpass_query(lat: float, lon: float, radius: int, highways: List[str
     str
         A complete Overpass QL query string.
     """
-    # Build the highway filter part of the query.  Each tag gets its own
-    # predicate combined with an OR.
+    # Build the highway filter as a single anchored regex predicate so the
+    # server performs one spatial scan instead of one per tag.
     if not highways:
         raise ValueError("At least one highway type must be specified")
-    highway_predicates = "".join([
-        f"way(around:{radius},{lat},{lon})[highway={h}];"
-        for h in highways
-    ])
+    pattern = "|".join(re.escape(h) for h in highways)
+    highway_predicates = f'way(around:{radius},{lat},{lon})[highway~"^({pattern})$"];'
     # Request both the way and its nodes' geometry.  The 'out geom' clause
     # ensures we get coordinate arrays for each way.
     query = (
@@ -119,30 +136,44 @@ def fetch_osm_roads(lat: float, lon: float, radius: int, highways: List[str], en
         Parsed JSON response from Overpass containing the selected ways.
     """
     query = build_overpass_query(lat, lon, radius, highways)
-    response = requests.post(endpoint, data=query)
+    response = _SESSION.post(endpoint, data=query)
     response.raise_for_status()
-    return response.json()
+    return loads(response.content)
 
 
-def convert_to_geojson(overpass_data: dict) -> dict:
-    """Convert Overpass JSON to a minimal GeoJSON structure.
+def iter_osm_elements(lat: float, lon: float, radius: int, highways: List[str], endpoint: str) -> Iterator[dict]:
+    """Yield Overpass elements while the response is still downloading.
 
-    The Overpass API returns data in a custom JSON schema.  This function
-    extracts road features with their geometry and properties and wraps
-    them in a standard GeoJSON FeatureCollection.
+    When ``ijson`` is installed the response body is parsed incrementally,
+    so peak memory no longer holds the whole payload and gzip decoding and
+    parsing overlap with the network transfer.  Without ``ijson`` this falls back to
+    :func:`fetch_osm_roads`.
+
+    Parameters are the same as for :func:`fetch_osm_roads`.
+    """
+    if ijson is None:
+        yield from fetch_osm_roads(lat, lon, radius, highways, endpoint).get("elements", [])
+        return
+    query = build_overpass_query(lat, lon, radius, highways)
+    with _SESSION.post(endpoint, data=query, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, "elements.item", use_float=True)
+
+
+def iter_road_features(elements: Iterable[dict]) -> Iterator[Dict]:
+    """Yield GeoJSON LineString features for each way among Overpass elements.
 
     Parameters
     ----------
-    overpass_data: dict
-        Raw Overpass output.
+    elements: iterable of dict
+        The ``elements`` of an Overpass response (list or stream).
 
-    Returns
-    -------
+    Yields
+    ------
     dict
-        A GeoJSON FeatureCollection.
+        A GeoJSON Feature per way with a usable geometry.
     """
-    elements = overpass_data.get("elements", [])
-    features = []
     for el in elements:
         if el.get("type") != "way":
             continue
@@ -167,20 +198,32 @@ def convert_to_geojson(overpass_data: dict) -> dict:
             },
             "properties": properties,
         }
-        features.append(feature)
+        yield feature
+
+
+def convert_to_geojson(overpass_data: dict) -> dict:
+    """Convert Overpass JSON to a minimal GeoJSON structure.
+
+    The Overpass API returns data in a custom JSON schema.  This function
+    extracts road features with their geometry and properties and wraps
+    them in a standard GeoJSON FeatureCollection.
+
+    Parameters
+    ----------
+    overpass_data: dict
+        Raw Overpass output.
+
+    Returns
+    -------
+    dict
+        A GeoJSON FeatureCollection.
+    """
     return {
         "type": "FeatureCollection",
-        "features": features,
+        "features": list(iter_road_features(overpass_data.get("elements", []))),
     }
 
 
-def ensure_dir(path: str) -> None:
-    """Ensure that the directory for the given file path exists."""
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
-
-
 def main() -> None:
     parser = argparse.ArgumentParser(description="Fetch OSM roads via Overpass API")
     parser.add_argument("--lat", type=float, required=True, help="Centre latitude")
@@ -209,6 +252,19 @@ def main() -> None:
         default="data/osm/roads.geojson",
         help="Path to write GeoJSON output (default: data/osm/roads.geojson)",
     )
+    # --ndjson is shorthand for --format ndjson, so the two cannot be combined.
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="geojson",
+        help="Output format: geojson (default), ndjson or fgb (FlatGeobuf, needs pyogrio)",
+    )
+    output_format.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one Feature per line); same as --format ndjson",
+    )
     parser.add_argument(
         "--cache-dir",
         type=str,
@@ -234,33 +290,54 @@ def main() -> None:
     cache: Optional[DiskCache] = None
     if not args.no_cache:
         ttl = args.cache_ttl if args.cache_ttl > 0 else None
-        cache = DiskCache(Path(args.cache_dir), namespace="overpass", max_age=ttl)
+        cache = DiskCache(Path(args.cache_dir), namespace="overpass", max_age=ttl, compress=True)
 
+    fmt = "ndjson" if args.ndjson else args.format
+    ensure_dir(args.output)
     try:
-        def _request() -> dict:
-            return fetch_osm_roads(args.lat, args.lon, args.radius, highways, args.endpoint)
-
         if cache:
+            def _request() -> dict:
+                # Only the elements are cached; collecting them from the
+                # stream overlaps download, gzip decoding and parsing.
+                elements = iter_osm_elements(args.lat, args.lon, args.radius, highways, args.endpoint)
+                return {"elements": list(elements)}
+
+            # Key on the exact query text so any change to the query builder
+            # invalidates stale entries automatically.
             request_key = DiskCache.key_from_mapping(
                 {
-                    "lat": round(args.lat, 6),
-                    "lon": round(args.lon, 6),
-                    "radius": args.radius,
-                    "highways": highways,
+                    "query": build_overpass_query(args.lat, args.lon, args.radius, highways),
                     "endpoint": args.endpoint,
                 }
             )
-            overpass_data = cache.get_or_create(request_key, _request)
+            elements = cache.get_or_create(request_key, _request).get("elements", [])
         else:
-            overpass_data = _request()
+            # Nothing needs the full payload, so stream ways straight to disk.
+            elements = iter_osm_elements(args.lat, args.lon, args.radius, highways, args.endpoint)
+
+        # Pulling the first feature starts the stream, so an empty result is
+        # known before anything is written (FlatGeobuf cannot be empty).
+        features = iter_road_features(elements)
+        first = next(features, None)
+        count = 0
+        if first is not None or fmt != "fgb":
+            # Write to a sibling temp file and rename it into place, so a
+            # failed stream never leaves a truncated output behind.  The
+            # temp name keeps the extension: GDAL's FlatGeobuf driver treats
+            # a path without ``.fgb`` as a directory.
+            root, ext = os.path.splitext(args.output)
+            tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+            try:
+                count = write_features(tmp_path, chain([first] if first is not None else [], features), fmt)
+                os.replace(tmp_path, args.output)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
     except Exception as exc:
         raise SystemExit(f"Failed to fetch data from Overpass: {exc}")
-
-    geojson = convert_to_geojson(overpass_data)
-    ensure_dir(args.output)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(geojson, f)
-    print(f"Wrote {len(geojson['features'])} road features to {args.output}")
+    if first is None and fmt == "fgb":
+        raise SystemExit(f"Overpass returned no road features; nothing written to {args.output} (FlatGeobuf cannot be empty)")
+    print(f"Wrote {count} road features to {args.output}")
 
 
 if __name__ == "__main__":
@@ -13,6 +13,12 @@ a simple haversine formula, which is sufficiently accurate for small
 intervals (tens or hundreds of metres).  Bearings are calculated from
 consecutive points.
 
+Each line is processed as whole NumPy arrays (segment lengths, bearings and
+cumulative arc length), so the per-vertex work runs in compiled ufuncs
+rather than the interpreter.
+The scalar ``haversine_distance``/``bearing``/``interpolate_point`` helpers
+are kept as readable references for the vectorised formulas.
+
 Usage
 -----
 
@@ -28,6 +34,19 @@ Parameters
     Path where the generated sample points will be written as a GeoJSON
     FeatureCollection.  Each feature has properties: ``road_id`` and
     ``bearing`` (degrees from north).
+--format:
+    ``geojson`` (default), ``ndjson`` or ``fgb``.  ``fgb`` writes a binary
+    FlatGeobuf file with a spatial index and requires ``pyogrio``.
+--ndjson:
+    Write newline-delimited GeoJSON (one Feature per line) so samples are
+    streamed to disk instead of collected in memory first.  Same as
+    ``--format ndjson``.
+--workers:
+    Number of worker processes used to densify roads in parallel.  Defaults
+    to 1 (no pool); 0 uses every available CPU.  Sample order is preserved.
+--simplify:
+    Douglas-Peucker tolerance in metres used to drop near-collinear vertices
+    before densifying.  Defaults to ``step / 10``; 0 keeps every vertex.
 
 Notes
 -----
@@ -38,10 +57,17 @@ imagery service, ensure that your sampling interval is not too fine
 """
 
 import argparse
-import json
 import math
 import os
-from typing import List, Tuple
+from functools import partial
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from natura.io import OUTPUT_FORMATS, ensure_dir, iter_geojson_features, write_features
+
+EARTH_RADIUS_M = 6371000.0  # mean Earth radius in metres
 
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -61,7 +87,7 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     float
         Distance in metres.
     """
-    R = 6371000.0  # mean Earth radius in metres
+    R = EARTH_RADIUS_M
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
@@ -113,7 +139,59 @@ def interpolate_point(lat1: float, lon1: float, lat2: float, lon2: float, fracti
     return lat, lon
 
 
-def densify_line(coords: List[List[float]], step: float) -> List[Tuple[float, float, float]]:
+def douglas_peucker(coords: List[List[float]], tolerance: float) -> np.ndarray:
+    """Simplify a ``[lon, lat]`` line with the Douglas-Peucker algorithm.
+
+    Vertices closer than ``tolerance`` metres to the chord of their span are
+    dropped.  Coordinates are projected once per line onto a local
+    equirectangular plane (longitude scaled by ``cos`` of the mean
+    latitude), spans are processed from an explicit stack instead of by
+    recursion, and the perpendicular distance test compares squared values
+    so no square root is taken.
+
+    Returns an ``(M, 2)`` array of the retained ``[lon, lat]`` vertices,
+    always including both endpoints.
+    """
+    arr = np.asarray(coords, dtype=np.float64)[:, :2]
+    n = arr.shape[0]
+    if n < 3 or tolerance <= 0:
+        return arr
+    lat0 = math.radians(float(arr[:, 1].mean()))
+    x = np.radians(arr[:, 0]) * (EARTH_RADIUS_M * math.cos(lat0))
+    y = np.radians(arr[:, 1]) * EARTH_RADIUS_M
+    tol_sq = tolerance * tolerance
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = x[first], y[first]
+        dx, dy = x[last] - ax, y[last] - ay
+        px = x[first + 1:last] - ax
+        py = y[first + 1:last] - ay
+        chord_sq = dx * dx + dy * dy
+        if chord_sq > 0.0:
+            # |cross|^2 / |chord|^2 is the squared perpendicular distance;
+            # keep it multiplied out so the comparison needs no division.
+            cross = px * dy - py * dx
+            dist_sq = cross * cross
+            limit = tol_sq * chord_sq
+        else:
+            dist_sq = px * px + py * py
+            limit = tol_sq
+        i = int(np.argmax(dist_sq))
+        if dist_sq[i] > limit:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return arr[keep]
+
+
+def densify_line(coords: List[List[float]], step: float) -> np.ndarray:
     """Generate sample points along a line.
 
     Given a list of [lon, lat] pairs representing a road segment, this
@@ -121,41 +199,106 @@ def densify_line(coords: List[List[float]], step: float) -> List[Tuple[float, fl
     step length.  For each sample, it also calculates the local bearing
     using the segment on which it lies.
 
-    Returns a list of tuples (lat, lon, bearing).
+    The work is done on whole coordinate arrays: segment lengths are
+    computed with a vectorised haversine formula, the cumulative arc length
+    locates the host segment of every sample via ``np.searchsorted``,
+    positions are linearly interpolated within it and bearings are computed
+    only for the host segments.
+
+    Returns an ``(N, 3)`` array of rows (lat, lon, bearing).
     """
-    samples = []
+    if step <= 0:
+        raise ValueError("step must be > 0")
     if len(coords) < 2:
-        return samples
-    # Track leftover distance from previous segment to ensure constant spacing
-    leftover = 0.0
-    prev_lat, prev_lon = coords[0][1], coords[0][0]
-    for i in range(1, len(coords)):
-        curr_lon, curr_lat = coords[i]
-        segment_length = haversine_distance(prev_lat, prev_lon, curr_lat, curr_lon)
-        seg_bearing = bearing(prev_lat, prev_lon, curr_lat, curr_lon)
-        # Distance along the segment including leftover from previous segments
-        distance_covered = leftover
-        while distance_covered + step <= segment_length:
-            # Determine the fraction along the current segment where this sample falls
-            fraction = (distance_covered + step) / segment_length
-            s_lat, s_lon = interpolate_point(prev_lat, prev_lon, curr_lat, curr_lon, fraction)
-            samples.append((s_lat, s_lon, seg_bearing))
-            distance_covered += step
-        # Update leftover to the remainder of the segment not covered by a full step
-        leftover = segment_length - distance_covered
-        prev_lat, prev_lon = curr_lat, curr_lon
-    return samples
-
-
-def load_geojson(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+        return np.empty((0, 3), dtype=np.float64)
+    arr = np.asarray(coords, dtype=np.float64)[:, :2]
+    lon = arr[:, 0]
+    lat = arr[:, 1]
+
+    phi = np.radians(lat)
+    dphi = np.diff(phi)
+    dlam = np.diff(np.radians(lon))
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+    a = np.sin(dphi / 2) ** 2 + cos_phi[:-1] * cos_phi[1:] * np.sin(dlam / 2) ** 2
+    seg_len = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    cum = np.concatenate(([0.0], np.cumsum(seg_len)))
+    count = int(cum[-1] // step)
+    if count == 0:
+        return np.empty((0, 3), dtype=np.float64)
+    targets = step * np.arange(1, count + 1, dtype=np.float64)
+    # side="left" picks the segment whose end is >= target, so samples that
+    # land exactly on a vertex belong to the segment ending there and the
+    # host segment never has zero length.
+    idx = np.searchsorted(cum, targets, side="left") - 1
+    frac = (targets - cum[idx]) / seg_len[idx]
+
+    out = np.empty((count, 3), dtype=np.float64)
+    out[:, 0] = lat[idx] + (lat[idx + 1] - lat[idx]) * frac
+    out[:, 1] = lon[idx] + (lon[idx + 1] - lon[idx]) * frac
+    # Bearings are only needed for segments that actually host a sample;
+    # with OSM vertex spacing usually well below the step that is a small
+    # subset, so the remaining trig runs on far fewer elements.
+    hosts, inverse = np.unique(idx, return_inverse=True)
+    dl = dlam[hosts]
+    x = np.sin(dl) * cos_phi[hosts + 1]
+    y = cos_phi[hosts] * sin_phi[hosts + 1] - sin_phi[hosts] * cos_phi[hosts + 1] * np.cos(dl)
+    out[:, 2] = ((np.degrees(np.arctan2(x, y)) + 360) % 360)[inverse]
+    return out
+
+
+def process_feature(feat: Dict, step: float, tolerance: Optional[float] = None) -> Tuple[Any, List[List[float]]]:
+    """Densify one road feature; returns ``(road_id, [[lat, lon, bearing], ...])``.
+
+    The line is first simplified with :func:`douglas_peucker` using
+    ``tolerance`` metres (default ``step / 10``; 0 disables it), which drops
+    the near-collinear vertices common in OSM ways before densification.
+
+    Kept at module level so it can be dispatched to worker processes.
+    """
+    road_id = feat.get("properties", {}).get("id")
+    geom = feat.get("geometry", {})
+    if geom.get("type") != "LineString":
+        return road_id, []
+    coords = geom.get("coordinates", [])
+    if len(coords) < 2:
+        return road_id, []
+    if tolerance is None:
+        tolerance = step / 10.0
+    return road_id, densify_line(douglas_peucker(coords, tolerance), step).tolist()
+
+
+def iter_sample_features(
+    road_features: Iterable[Dict],
+    step: float,
+    workers: int = 1,
+    tolerance: Optional[float] = None,
+) -> Iterator[Dict]:
+    """Yield a Point feature for every sample along each road LineString.
+
+    With ``workers`` > 1 the roads are densified in a process pool; results
+    are consumed in input order so sample indices stay deterministic.
+    """
+    worker = partial(process_feature, step=step, tolerance=tolerance)
+    if workers > 1:
+        with Pool(workers) as pool:
+            yield from _iter_point_features(pool.imap(worker, road_features, chunksize=64))
+    else:
+        yield from _iter_point_features(map(worker, road_features))
+
+
+def _iter_point_features(results: Iterable[Tuple[Any, List[List[float]]]]) -> Iterator[Dict]:
+    for road_id, samples in results:
+        for lat, lon, brg in samples:
+            yield {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {
+                    "road_id": road_id,
+                    "bearing": brg,
+                },
+            }
 
 
 def main() -> None:
@@ -168,34 +311,39 @@ def main() -> None:
         default="data/osm/samples.geojson",
         help="Path to write sample points GeoJSON",
     )
+    # --ndjson is shorthand for --format ndjson, so the two cannot be combined.
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="geojson",
+        help="Output format: geojson (default), ndjson or fgb (FlatGeobuf, needs pyogrio)",
+    )
+    output_format.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one Feature per line); same as --format ndjson",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for densification (default: 1; 0 = all CPUs)",
+    )
+    parser.add_argument(
+        "--simplify",
+        type=float,
+        default=None,
+        help="Douglas-Peucker tolerance in metres applied before densifying (default: step/10; 0 disables)",
+    )
     args = parser.parse_args()
 
-    data = load_geojson(args.input)
-    features = data.get("features", [])
-    out_features = []
-    for feat in features:
-        geom = feat.get("geometry", {})
-        if geom.get("type") != "LineString":
-            continue
-        coords = geom.get("coordinates", [])
-        road_id = feat.get("properties", {}).get("id")
-        samples = densify_line(coords, args.step)
-        for lat, lon, brg in samples:
-            out_features.append(
-                {
-                    "type": "Feature",
-                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
-                    "properties": {
-                        "road_id": road_id,
-                        "bearing": brg,
-                    },
-                }
-            )
-    result = {"type": "FeatureCollection", "features": out_features}
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    features = iter_geojson_features(args.input)
+    sample_features = iter_sample_features(features, args.step, workers=workers, tolerance=args.simplify)
     ensure_dir(args.output)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(result, f)
-    print(f"Generated {len(out_features)} sample points written to {args.output}")
+    count = write_features(args.output, sample_features, "ndjson" if args.ndjson else args.format)
+    print(f"Generated {count} sample points written to {args.output}")
 
 
 if __name__ == "__main__":
@@ -14,15 +14,32 @@ python 02_grid_samples.py \
   --radius 25000 \
   --step 200 \
   --output data/osm/grid_samples.geojson
+
+Pass ``--ndjson`` to write newline-delimited GeoJSON (one Feature per line),
+or ``--format fgb`` to write FlatGeobuf (requires ``pyogrio``).
 """
 
 import argparse
-import json
 import math
-import os
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from natura.geo import haversine_m_array
+from natura.io import OUTPUT_FORMATS, ensure_dir, write_features
+
+
+# Relative half-width of the rim band where the equirectangular estimate is
+# not trusted and the exact haversine distance decides membership.
+RIM_TOLERANCE = 0.05
 
-from natura.geo import haversine_m
+# The estimate drifts from haversine by roughly 0.2 * (radius / R) *
+# tan(|lat|) of the radius towards the poles; the band is widened by this
+# factor (a 2.5x margin) times that term.  Once the band reaches the centre
+# every candidate is checked with haversine.
+RIM_CURVATURE_FACTOR = 0.5
+EARTH_RADIUS_M = 6371000.0
 
 
 def meters_to_lat_delta(meters: float) -> float:
@@ -33,7 +50,35 @@ def meters_to_lon_delta(meters: float, lat: float) -> float:
     return meters / (111_320.0 * max(0.0001, math.cos(math.radians(lat))))
 
 
-def iter_grid_points(center_lat: float, center_lon: float, radius_m: float, step_m: float) -> List[Tuple[float, float, int, int]]:
+@dataclass
+class GridPoints:
+    """Lattice points stored as parallel arrays (structure of arrays).
+
+    Coordinates stay float64 so written GeoJSON keeps full precision; row and
+    column indices use compact int32 columns.
+    """
+
+    lat: np.ndarray
+    lon: np.ndarray
+    row: np.ndarray
+    col: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+    def iter_rows(self) -> Iterator[Tuple[float, float, int, int]]:
+        """Yield (lat, lon, row, col) tuples as plain Python scalars."""
+        return zip(self.lat.tolist(), self.lon.tolist(), self.row.tolist(), self.col.tolist())
+
+
+def grid_point_arrays(center_lat: float, center_lon: float, radius_m: float, step_m: float) -> GridPoints:
+    """Return every lattice point within ``radius_m`` as :class:`GridPoints`.
+
+    Rows are spaced ``step_m`` apart in latitude starting at the southern edge
+    of the circle; each row is spaced ``step_m`` in longitude starting at its
+    own western edge.  The whole candidate lattice is built as NumPy arrays
+    and filtered with vectorised distance masks.
+    """
     if step_m <= 0:
         raise ValueError("step must be > 0")
 
@@ -42,57 +87,89 @@ def iter_grid_points(center_lat: float, center_lon: float, radius_m: float, step
     min_lat = center_lat - lat_radius
     max_lat = center_lat + lat_radius
 
-    points: List[Tuple[float, float, int, int]] = []
-    row = 0
-    lat = min_lat
-    while lat <= max_lat + 1e-12:
-        lon_step = meters_to_lon_delta(step_m, lat)
-        lon_radius = meters_to_lon_delta(radius_m, lat)
-        min_lon = center_lon - lon_radius
-        max_lon = center_lon + lon_radius
-        col = 0
-        lon = min_lon
-        while lon <= max_lon + 1e-12:
-            if haversine_m(center_lat, center_lon, lat, lon) <= radius_m:
-                points.append((lat, lon, row, col))
-            lon += lon_step
-            col += 1
-        lat += lat_step
-        row += 1
-    return points
+    n_rows = int(math.floor((max_lat - min_lat + 1e-12) / lat_step)) + 1
+    rows = np.arange(n_rows)
+    lats = min_lat + rows * lat_step
+
+    # Per-row longitude spacing; the radius/step ratio (and hence the column
+    # count) is the same for every row because the cos(lat) terms cancel.
+    lon_scale = 111_320.0 * np.maximum(0.0001, np.cos(np.radians(lats)))
+    lon_steps = step_m / lon_scale
+    lon_radii = radius_m / lon_scale
+    n_cols = int(math.floor((2 * radius_m / step_m) + 1e-9)) + 1
+    cols = np.arange(n_cols)
+    lons = (center_lon - lon_radii)[:, None] + cols[None, :] * lon_steps[:, None]
+
+    # Cheap equirectangular pre-filter in each row's own metric scale: the
+    # offsets of row ``r`` / column ``c`` from the centre are exactly
+    # ``r * step_m - radius_m`` and ``c * step_m - radius_m``, so they are
+    # derived from the step directly rather than from degree differences.
+    # Points clearly inside or outside the circle skip the trig entirely and
+    # only the band around the rim gets the exact haversine check.  The band
+    # widens with the circle's size and its latitude nearest the pole, where
+    # the estimate is worst.
+    dy = rows * step_m - radius_m
+    dx = cols * step_m - radius_m
+    approx_sq = dy[:, None] ** 2 + dx[None, :] ** 2
+    polar_lat = abs(center_lat) + lat_radius
+    if polar_lat >= 90.0:
+        rim = math.inf
+    else:
+        rim = RIM_TOLERANCE + RIM_CURVATURE_FACTOR * (radius_m / EARTH_RADIUS_M) * math.tan(math.radians(polar_lat))
+    if rim >= 1.0:
+        mask = np.zeros(approx_sq.shape, dtype=bool)
+        band = np.ones(approx_sq.shape, dtype=bool)
+    else:
+        mask = approx_sq <= (radius_m * (1.0 - rim)) ** 2
+        band = ~mask & (approx_sq <= (radius_m * (1.0 + rim)) ** 2)
+    band_rows, band_cols = np.nonzero(band)
+    mask[band_rows, band_cols] = (
+        haversine_m_array(center_lat, center_lon, lats[band_rows], lons[band_rows, band_cols]) <= radius_m
+    )
+    rows_idx, cols_idx = np.nonzero(mask)
+    return GridPoints(
+        lat=lats[rows_idx],
+        lon=lons[rows_idx, cols_idx],
+        row=rows_idx.astype(np.int32),
+        col=cols_idx.astype(np.int32),
+    )
 
 
-def build_test_grid_samples() -> List[Tuple[float, float, int, int]]:
-    """Return a fixed 1km grid for a known test area."""
+def iter_grid_points(center_lat: float, center_lon: float, radius_m: float, step_m: float) -> List[Tuple[float, float, int, int]]:
+    """Return (lat, lon, row, col) for every lattice point within ``radius_m``."""
+    return list(grid_point_arrays(center_lat, center_lon, radius_m, step_m).iter_rows())
+
+
+def build_test_grid_arrays() -> GridPoints:
+    """Return a fixed 1km grid for a known test area as :class:`GridPoints`."""
     center_lat = 42.5389
     center_lon = -71.0481
     radius_m = 25_000.0
     step_m = 1000.0
-    return iter_grid_points(center_lat, center_lon, radius_m, step_m)
+    return grid_point_arrays(center_lat, center_lon, radius_m, step_m)
 
 
-def build_feature_collection(points: List[Tuple[float, float, int, int]]) -> dict:
-    features = []
+def build_test_grid_samples() -> List[Tuple[float, float, int, int]]:
+    """Return a fixed 1km grid for a known test area."""
+    return list(build_test_grid_arrays().iter_rows())
+
+
+def iter_features(points: Iterable[Tuple[float, float, int, int]]) -> Iterator[Dict]:
     for idx, (lat, lon, row, col) in enumerate(points):
-        features.append(
-            {
-                "type": "Feature",
-                "geometry": {"type": "Point", "coordinates": [lon, lat]},
-                "properties": {
-                    "grid_id": f"r{row}_c{col}",
-                    "grid_row": row,
-                    "grid_col": col,
-                    "grid_index": idx,
-                },
-            }
-        )
-    return {"type": "FeatureCollection", "features": features}
-
-
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+        yield {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {
+                "grid_id": f"r{row}_c{col}",
+                "grid_row": row,
+                "grid_col": col,
+                "grid_index": idx,
+            },
+        }
+
+
+def build_feature_collection(points: List[Tuple[float, float, int, int]]) -> dict:
+    return {"type": "FeatureCollection", "features": list(iter_features(points))}
 
 
 def main() -> None:
@@ -112,16 +189,27 @@ def main() -> None:
         default="data/osm/grid_samples.geojson",
         help="Path to write GeoJSON point grid",
     )
+    # --ndjson is shorthand for --format ndjson, so the two cannot be combined.
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="geojson",
+        help="Output format: geojson (default), ndjson or fgb (FlatGeobuf, needs pyogrio)",
+    )
+    output_format.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one Feature per line); same as --format ndjson",
+    )
     args = parser.parse_args()
 
     if args.test_grid:
-        points = build_test_grid_samples()
+        points = build_test_grid_arrays()
     else:
-        points = iter_grid_points(args.center_lat, args.center_lon, args.radius, args.step)
-    fc = build_feature_collection(points)
+        points = grid_point_arrays(args.center_lat, args.center_lon, args.radius, args.step)
     ensure_dir(args.output)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(fc, f)
+    write_features(args.output, iter_features(points.iter_rows()), "ndjson" if args.ndjson else args.format)
     print(f"Wrote {len(points)} grid samples to {args.output}")
 
 
@@ -8,6 +8,10 @@ Automates a two-pass Mapillary metadata query:
 
 Merges the results into a single CSV with all sample points preserved.
 
+Both passes run in-process through ``query_samples`` from
+``03_mapillary_metadata.py``, so misses are handed from pass 1 to pass 2 in
+memory and sample indices always refer to the original input file.
+
 Usage
 -----
     $env:MAPILLARY_TOKEN="MLY|24448759648080414|5ba810a40676897e2f400df4b32af2e7"
@@ -19,54 +23,34 @@ Usage
 
 import argparse
 import csv
-import json
+import importlib.util
 import os
-import subprocess
-import sys
-from typing import Dict, List
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from natura.cache import BufferedCache, DiskCache
+from natura.io import ensure_dir
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
 
-def load_csv(path: str) -> List[Dict[str, str]]:
-    with open(path, newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f))
+def load_metadata_module() -> object:
+    path = Path(__file__).resolve().parent / "03_mapillary_metadata.py"
+    spec = importlib.util.spec_from_file_location("mapillary_metadata", path)
+    if spec is None or spec.loader is None:
+        raise SystemExit("Failed to load 03_mapillary_metadata.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore[attr-defined]
+    return module
 
-def save_csv(path: str, rows: List[Dict[str, str]], fieldnames: List[str]) -> None:
+def save_csv(path: str, rows: List[Dict[str, object]], fieldnames: List[str]) -> None:
     ensure_dir(path)
+    # Rows already carry exactly these keys, so a plain writer fed by an
+    # itemgetter skips DictWriter's per-row key validation.
+    row_values = itemgetter(*fieldnames)
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(rows)
-
-def write_geojson(path: str, rows: List[Dict[str, str]]) -> None:
-    feats = []
-    for row in rows:
-        if not row["sample_lat"] or not row["sample_lon"]:
-            continue
-        lat, lon = float(row["sample_lat"]), float(row["sample_lon"])
-        feats.append({
-            "type": "Feature",
-            "geometry": {"type": "Point", "coordinates": [lon, lat]},
-            "properties": {"index": row["sample_index"]}
-        })
-    geo = {"type": "FeatureCollection", "features": feats}
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(geo, f)
-
-def run_pass(input_geojson: str, output_csv: str, radius: int, verbose: bool):
-    cmd = [
-        sys.executable, "03_mapillary_metadata.py",
-        "--input", input_geojson,
-        "--radius", str(radius),
-        "--output", output_csv,
-    ]
-    if verbose:
-        cmd.append("--verbose")
-    print("Running:", " ".join(cmd))
-    subprocess.run(cmd, check=True)
+        w = csv.writer(f)
+        w.writerow(fieldnames)
+        w.writerows(map(row_values, rows))
 
 def main():
     p = argparse.ArgumentParser()
@@ -74,39 +58,66 @@ def main():
     p.add_argument("--out", required=True, help="Final merged CSV")
     p.add_argument("--radius1", type=int, default=400, help="Tight radius (m)")
     p.add_argument("--radius2", type=int, default=1000, help="Wide radius (m)")
+    p.add_argument(
+        "--token",
+        default=os.environ.get("MAPILLARY_TOKEN"),
+        help="Mapillary API access token (or set MAPILLARY_TOKEN env var)",
+    )
+    p.add_argument("--concurrency", type=int, default=8, help="Concurrent Mapillary requests (default: 8)")
+    p.add_argument("--cache-dir", default="data/cache", help="Directory for metadata cache")
+    p.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=14 * 24 * 3600,
+        help="Cache expiry in seconds (default: 14 days). Set to 0 for no expiry.",
+    )
+    p.add_argument("--no-cache", action="store_true", help="Disable caching Mapillary metadata requests")
     p.add_argument("--verbose", action="store_true")
     args = p.parse_args()
 
-    tmp1 = "data/im_meta/_pass1.csv"
-    tmp2 = "data/im_meta/_pass2.csv"
-    misses_geo = "data/osm/_misses.geojson"
-
-    # Pass 1
-    run_pass(args.input, tmp1, args.radius1, args.verbose)
-    rows1 = load_csv(tmp1)
-
-    # Collect misses (empty image_id)
-    misses = [r for r in rows1 if not r["image_id"]]
-    print(f"Pass 1 matched {len(rows1) - len(misses)} / {len(rows1)}")
-
-    if misses:
-        write_geojson(misses_geo, misses)
-        run_pass(misses_geo, tmp2, args.radius2, args.verbose)
-        rows2 = load_csv(tmp2)
-        rows2_map = {r["sample_index"]: r for r in rows2 if r["image_id"]}
-    else:
-        rows2_map = {}
-
-    # Merge results: prefer pass1 rows, fill from pass2 where empty
-    merged = []
-    for r in rows1:
-        if not r["image_id"] and r["sample_index"] in rows2_map:
-            merged.append(rows2_map[r["sample_index"]])
-        else:
-            merged.append(r)
-
-    fieldnames = list(rows1[0].keys())
-    save_csv(args.out, merged, fieldnames)
+    if not args.token:
+        raise SystemExit("A Mapillary access token is required. Provide via --token or MAPILLARY_TOKEN env var.")
+
+    meta_mod = load_metadata_module()
+    concurrency = max(1, args.concurrency)
+    sess = meta_mod.make_session(args.token, pool_size=max(10, concurrency))
+    cache: Optional[BufferedCache] = None
+    if not args.no_cache:
+        ttl = args.cache_ttl if args.cache_ttl > 0 else None
+        cache = BufferedCache(DiskCache(Path(args.cache_dir), namespace="mapillary_metadata", max_age=ttl))
+
+    samples = meta_mod.load_samples(args.input)
+    print(f"Loaded {len(samples)} sample points from {args.input}")
+
+    try:
+        # Pass 1
+        print(f"Pass 1: radius {args.radius1} m")
+        rows1 = list(meta_mod.query_samples(
+            sess, samples, args.radius1, cache=cache, verbose=args.verbose, concurrency=concurrency
+        ))
+
+        # Collect misses (empty image_id) by position; rows1 is aligned with samples
+        miss_positions = [i for i, row in enumerate(rows1) if not row["image_id"]]
+        print(f"Pass 1 matched {len(rows1) - len(miss_positions)} / {len(rows1)}")
+
+        # Merge results in place: keep pass1 rows, fill misses from pass2 hits
+        merged = list(rows1)
+        if miss_positions:
+            print(f"Pass 2: radius {args.radius2} m for {len(miss_positions)} misses")
+            misses = [samples[i] for i in miss_positions]
+            rows2 = meta_mod.query_samples(
+                sess, misses, args.radius2, cache=cache, verbose=args.verbose, concurrency=concurrency
+            )
+            for i, row in zip(miss_positions, rows2):
+                if row["image_id"]:
+                    merged[i] = row
+    finally:
+        # Flush even if a pass fails or is interrupted, so the lookups
+        # already made are not lost.
+        if cache is not None:
+            cache.flush()
+
+    save_csv(args.out, merged, meta_mod.FIELDNAMES)
     print(f"Merged output written to {args.out} "
           f"({sum(1 for r in merged if r['image_id'])}/{len(merged)} matched)")
 
@@ -12,53 +12,114 @@ python 03_google_streetview.py \
   --key $GOOGLE_MAPS_API_KEY \
   --output data/google/im_meta/google_grid.csv \
   --images-dir data/google/images
+
+Metadata lookups and image downloads for up to ``--concurrency`` samples
+(default: 16) run at once in a thread pool sharing one keep-alive session;
+output rows keep the input sample order.
 """
 
 import argparse
 import csv
-import json
-import math
 import os
 import sys
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
+import numpy as np
 import requests
 
-from natura.cache import DiskCache
+from natura.cache import BufferedCache, DiskCache
 from natura.geo import haversine_m
+from natura.http import build_session, concurrent_map
+from natura.io import ensure_dir, iter_geojson_features
 
 
 METADATA_ENDPOINT = "https://maps.googleapis.com/maps/api/streetview/metadata"
 IMAGE_ENDPOINT = "https://maps.googleapis.com/maps/api/streetview"
-
-
-def load_samples(path: str) -> List[Dict[str, float]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    samples = []
-    for idx, feature in enumerate(data.get("features", [])):
+# Street View JPEGs are tens of KB; read them in a few large chunks.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Entries in the in-memory metadata memo kept in front of the disk cache.
+METADATA_MEMO_SIZE = 4096
+# Metadata statuses meaning "no imagery here"; only these are cached as
+# misses.  Anything else (quota, denied key, server error) is retried on the
+# next lookup.
+METADATA_MISS_STATUSES = ("ZERO_RESULTS", "NOT_FOUND")
+
+FIELDNAMES = [
+    "sample_index",
+    "sample_lat",
+    "sample_lon",
+    "image_id",
+    "image_lat",
+    "image_lon",
+    "compass_angle",
+    "image_distance_m",
+    "pano_id",
+]
+
+
+@dataclass
+class SampleArrays:
+    """Grid samples stored as parallel arrays (structure of arrays).
+
+    Large grids hold hundreds of thousands of points; three flat arrays
+    are far smaller than one dict per sample.  Iterating yields a
+    short-lived ``{"index", "lat", "lon"}`` dict per sample.
+    """
+
+    index: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.index.shape[0])
+
+    def __getitem__(self, item: slice) -> "SampleArrays":
+        return SampleArrays(self.index[item], self.lat[item], self.lon[item])
+
+    def __iter__(self) -> Iterator[Dict[str, float]]:
+        for idx, lat, lon in zip(self.index.tolist(), self.lat.tolist(), self.lon.tolist()):
+            yield {"index": idx, "lat": lat, "lon": lon}
+
+
+def load_samples(path: str) -> SampleArrays:
+    indices: List[int] = []
+    lats: List[float] = []
+    lons: List[float] = []
+    for idx, feature in enumerate(iter_geojson_features(path)):
         geom = feature.get("geometry") or {}
         if geom.get("type") != "Point":
             continue
         coords = geom.get("coordinates") or []
         if len(coords) < 2:
             continue
-        lon, lat = coords[:2]
-        samples.append({"index": idx, "lat": lat, "lon": lon})
-    return samples
+        indices.append(idx)
+        lons.append(coords[0])
+        lats.append(coords[1])
+    return SampleArrays(
+        index=np.asarray(indices, dtype=np.int64),
+        lat=np.asarray(lats, dtype=np.float64),
+        lon=np.asarray(lons, dtype=np.float64),
+    )
+
 
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Create a session whose connection pool can serve ``pool_size`` threads.
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+    The default urllib3 pool keeps 10 connections per host; size it to at
+    least the number of concurrent requests so keep-alive connections are
+    reused instead of discarded.  Rate limited (429) and transient 5xx
+    responses are retried with exponential backoff.
+    """
+    return build_session(retries=5, backoff_factor=0.5, allowed_methods=("GET",), pool_size=pool_size)
 
 
-def meters_to_bbox(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
-    dlat = radius_m / 111_320.0
-    dlon = radius_m / (111_320.0 * max(0.0001, math.cos(math.radians(lat))))
-    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+class MetadataRequestError(Exception):
+    """A metadata lookup failed, so whether imagery exists is unknown."""
 
 
 def query_metadata(
@@ -69,6 +130,11 @@ def query_metadata(
     radius: Optional[int] = None,
     source: Optional[str] = None,
 ) -> Optional[Dict[str, str]]:
+    """Return Street View metadata, or ``None`` if there is no imagery.
+
+    Raises :class:`MetadataRequestError` when the request fails or the API
+    reports an error rather than a miss.
+    """
     params = {
         "location": f"{lat},{lon}",
         "key": key,
@@ -77,12 +143,18 @@ def query_metadata(
         params["radius"] = str(radius)
     if source:
         params["source"] = source
-    resp = sess.get(METADATA_ENDPOINT, params=params, timeout=20)
+    try:
+        resp = sess.get(METADATA_ENDPOINT, params=params, timeout=20)
+    except requests.RequestException as exc:
+        raise MetadataRequestError(f"Street View metadata request failed at ({lat:.6f},{lon:.6f}): {exc}")
     if resp.status_code != 200:
-        return None
+        raise MetadataRequestError(f"Street View metadata returned HTTP {resp.status_code} at ({lat:.6f},{lon:.6f})")
     data = resp.json()
-    if data.get("status") != "OK":
+    status = data.get("status")
+    if status in METADATA_MISS_STATUSES:
         return None
+    if status != "OK":
+        raise MetadataRequestError(f"Street View metadata returned {status} at ({lat:.6f},{lon:.6f})")
     return data
 
 
@@ -102,13 +174,29 @@ def download_image(
     }
     if source:
         params["source"] = source
-    resp = sess.get(IMAGE_ENDPOINT, params=params, timeout=30, stream=True)
+    try:
+        resp = sess.get(IMAGE_ENDPOINT, params=params, timeout=30, stream=True)
+    except requests.RequestException as exc:
+        print(f"[WARN] Street View image request failed at ({lat:.6f},{lon:.6f}): {exc}", file=sys.stderr)
+        return False
     if resp.status_code != 200:
         return False
-    with open(dest_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+    # Several samples can resolve to the same panorama; download to a
+    # per-thread temp file and rename so concurrent writers never interleave.
+    tmp_path = f"{dest_path}.{threading.get_ident()}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except requests.RequestException as exc:
+        print(f"[WARN] Street View image download failed at ({lat:.6f},{lon:.6f}): {exc}", file=sys.stderr)
+        return False
+    finally:
+        # Drop the partial file if the stream or the write failed.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return True
 
 
@@ -119,6 +207,170 @@ def build_image_id(meta: Dict[str, str], lat: float, lon: float) -> str:
     return f"loc_{lat:.6f}_{lon:.6f}"
 
 
+def lookup_metadata(
+    sess: requests.Session,
+    sample: Dict[str, float],
+    key: str,
+    radius: Optional[int] = None,
+    source: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+) -> Optional[Dict[str, str]]:
+    """Return Street View metadata for one sample, using the cache if given.
+
+    Misses are cached too (entries are wrapped as ``{"value": meta}``), so a
+    warm re-run whose images are already on disk makes no HTTP calls at all.
+    Failed requests raise :class:`MetadataRequestError` and are not cached.
+    """
+    lat = sample["lat"]
+    lon = sample["lon"]
+    cache_key = None
+
+    if cache is not None:
+        cache_key = DiskCache.key_from_mapping(
+            {
+                "lat": round(lat, 6),
+                "lon": round(lon, 6),
+                "radius": radius,
+                "source": source,
+            }
+        )
+        cached_entry = cache.load(cache_key)
+        if cached_entry is not None:
+            if "value" in cached_entry:
+                return cached_entry["value"]
+            return cached_entry  # entry written before misses were cached
+
+    meta = query_metadata(sess, lat, lon, key, radius=radius, source=source)
+    if cache is not None and cache_key is not None:
+        cache.save(cache_key, {"value": meta})
+    return meta
+
+
+MetadataLookup = Callable[[float, float], Optional[Dict[str, str]]]
+
+
+def make_metadata_lookup(
+    sess: requests.Session,
+    key: str,
+    radius: Optional[int] = None,
+    source: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+    maxsize: int = METADATA_MEMO_SIZE,
+) -> MetadataLookup:
+    """Return a ``(lat, lon) -> metadata`` lookup with an LRU memo in front.
+
+    Coordinates are rounded to 6 decimals, matching the disk cache key, so
+    repeated points are answered from memory without building a cache key
+    or touching the filesystem.
+    """
+    # Failed requests raise through the memo, which does not cache
+    # exceptions, so a later sample at the same point asks again.
+    @lru_cache(maxsize=maxsize)
+    def _lookup(lat6: float, lon6: float) -> Optional[Dict[str, str]]:
+        sample = {"lat": lat6, "lon": lon6}
+        return lookup_metadata(sess, sample, key, radius=radius, source=source, cache=cache)
+
+    def lookup(lat: float, lon: float) -> Optional[Dict[str, str]]:
+        try:
+            return _lookup(round(lat, 6), round(lon, 6))
+        except MetadataRequestError as exc:
+            print(f"[WARN] {exc}", file=sys.stderr)
+            return None
+
+    return lookup
+
+
+def process_sample(
+    sess: requests.Session,
+    sample: Dict[str, float],
+    key: str,
+    images_dir: str,
+    size: str,
+    radius: Optional[int] = None,
+    source: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+    lookup: Optional[MetadataLookup] = None,
+) -> Dict[str, object]:
+    """Look up one sample, download its image if needed and build its CSV row.
+
+    ``lookup`` (see :func:`make_metadata_lookup`) replaces the direct
+    metadata lookup when given.
+    """
+    lat = sample["lat"]
+    lon = sample["lon"]
+    if lookup is not None:
+        meta = lookup(lat, lon)
+    else:
+        try:
+            meta = lookup_metadata(sess, sample, key, radius=radius, source=source, cache=cache)
+        except MetadataRequestError as exc:
+            print(f"[WARN] {exc}", file=sys.stderr)
+            meta = None
+
+    if meta:
+        image_id = build_image_id(meta, lat, lon)
+        image_loc = (meta.get("location") or {})
+        image_lat = float(image_loc.get("lat", lat))
+        image_lon = float(image_loc.get("lng", lon))
+        image_distance = haversine_m(lat, lon, image_lat, image_lon)
+        dest_path = os.path.join(images_dir, f"{image_id}.jpg")
+        if not os.path.exists(dest_path):
+            ok = download_image(
+                sess,
+                image_lat,
+                image_lon,
+                key,
+                dest_path,
+                size=size,
+                source=source,
+            )
+            if not ok:
+                image_id = ""
+    else:
+        image_id = ""
+        image_lat = ""
+        image_lon = ""
+        image_distance = ""
+
+    return {
+        "sample_index": sample["index"],
+        "sample_lat": lat,
+        "sample_lon": lon,
+        "image_id": image_id,
+        "image_lat": image_lat,
+        "image_lon": image_lon,
+        "compass_angle": "",
+        "image_distance_m": image_distance,
+        "pano_id": (meta or {}).get("pano_id", ""),
+    }
+
+
+def process_samples(
+    sess: requests.Session,
+    samples: Iterable[Dict[str, float]],
+    key: str,
+    images_dir: str,
+    size: str,
+    radius: Optional[int] = None,
+    source: Optional[str] = None,
+    cache: Optional[DiskCache] = None,
+    concurrency: int = 1,
+) -> Iterator[Dict[str, object]]:
+    """Yield one output row per sample, in input order.
+
+    With ``concurrency`` > 1 up to that many samples (metadata lookup plus
+    image download) are processed at once in a thread pool; samples are
+    submitted in bounded batches so the number of pending futures stays
+    small.  Metadata goes through a :func:`make_metadata_lookup` memo.
+    """
+    lookup = make_metadata_lookup(sess, key, radius=radius, source=source, cache=cache)
+
+    def _process(sample: Dict[str, float]) -> Dict[str, object]:
+        return process_sample(sess, sample, key, images_dir, size, source=source, lookup=lookup)
+
+    return concurrent_map(_process, samples, concurrency)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Fetch Google Street View metadata + thumbnails for grid samples")
     parser.add_argument("--input", type=str, required=True, help="Input grid samples GeoJSON")
@@ -164,6 +416,12 @@ def main() -> None:
         default=None,
         help="Optional Google Street View source filter (e.g. 'outdoor')",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Samples processed concurrently (default: 16; 1 = sequential)",
+    )
     parser.add_argument(
         "--cache-dir",
         type=str,
@@ -192,97 +450,49 @@ def main() -> None:
     total = len(samples)
     print(f"Loaded {total} grid samples from {args.input}")
 
-    if not os.path.exists(args.images_dir):
-        os.makedirs(args.images_dir, exist_ok=True)
+    os.makedirs(args.images_dir, exist_ok=True)
     ensure_dir(args.output)
 
-    cache: Optional[DiskCache] = None
+    cache: Optional[BufferedCache] = None
     if not args.no_cache:
         ttl = args.cache_ttl if args.cache_ttl > 0 else None
-        cache = DiskCache(Path(args.cache_dir), namespace="google_streetview_metadata", max_age=ttl)
-
-    sess = requests.Session()
-    fieldnames = [
-        "sample_index",
-        "sample_lat",
-        "sample_lon",
-        "image_id",
-        "image_lat",
-        "image_lon",
-        "compass_angle",
-        "image_distance_m",
-        "pano_id",
-    ]
+        # Misses are written back in batches rather than one file per request.
+        cache = BufferedCache(DiskCache(Path(args.cache_dir), namespace="google_streetview_metadata", max_age=ttl))
 
-    matches = 0
-    with open(args.output, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for idx, sample in enumerate(samples, start=1):
-            lat = sample["lat"]
-            lon = sample["lon"]
-            cache_key = None
-            meta = None
+    concurrency = max(1, args.concurrency)
+    sess = make_session(pool_size=max(10, concurrency))
 
-            if cache is not None:
-                cache_key = DiskCache.key_from_mapping(
-                    {
-                        "lat": round(lat, 6),
-                        "lon": round(lon, 6),
-                        "radius": args.radius,
-                        "source": args.source,
-                    }
-                )
-                meta = cache.load(cache_key)
-
-            if meta is None:
-                meta = query_metadata(sess, lat, lon, args.key, radius=args.radius, source=args.source)
-                if cache is not None and cache_key is not None:
-                    cache.save(cache_key, meta)
-
-            if meta:
-                matches += 1
-                image_id = build_image_id(meta, lat, lon)
-                image_loc = (meta.get("location") or {})
-                image_lat = float(image_loc.get("lat", lat))
-                image_lon = float(image_loc.get("lng", lon))
-                image_distance = haversine_m(lat, lon, image_lat, image_lon)
-                dest_path = os.path.join(args.images_dir, f"{image_id}.jpg")
-                if not os.path.exists(dest_path):
-                    ok = download_image(
-                        sess,
-                        image_lat,
-                        image_lon,
-                        args.key,
-                        dest_path,
-                        size=args.size,
-                        source=args.source,
-                    )
-                    if not ok:
-                        image_id = ""
-            else:
-                image_id = ""
-                image_lat = ""
-                image_lon = ""
-                image_distance = ""
-
-            writer.writerow(
-                {
-                    "sample_index": sample["index"],
-                    "sample_lat": lat,
-                    "sample_lon": lon,
-                    "image_id": image_id,
-                    "image_lat": image_lat,
-                    "image_lon": image_lon,
-                    "compass_angle": "",
-                    "image_distance_m": image_distance,
-                    "pano_id": (meta or {}).get("pano_id", ""),
-                }
+    matches = 0
+    # Rows always carry exactly FIELDNAMES, so a plain writer fed by an
+    # itemgetter skips DictWriter's per-row key checks; a 1 MiB buffer
+    # batches the small row writes.
+    row_values = itemgetter(*FIELDNAMES)
+    try:
+        with open(args.output, "w", newline="", encoding="utf-8", buffering=1 << 20) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(FIELDNAMES)
+
+            rows = process_samples(
+                sess,
+                samples,
+                args.key,
+                args.images_dir,
+                args.size,
+                radius=args.radius,
+                source=args.source,
+                cache=cache,
+                concurrency=concurrency,
             )
-
-            if idx % 100 == 0 or idx == total:
-                print(f"Processed {idx}/{total} samples")
+            for idx, row in enumerate(rows, start=1):
+                if row["image_lat"] != "":
+                    matches += 1
+                writer.writerow(row_values(row))
+
+                if idx % 100 == 0 or idx == total:
+                    print(f"Processed {idx}/{total} samples")
+    finally:
+        if cache is not None:
+            cache.flush()
 
     print(f"Wrote metadata to {args.output}; matched {matches} images out of {total} samples")
 
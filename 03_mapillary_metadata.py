@@ -33,6 +33,9 @@ Parameters
     image_id, image_lat, image_lon, compass_angle, image_distance_m.
 --verbose:
     Print extra debug info when a point returns no candidates or requests fail.
+--concurrency:
+    Number of Mapillary requests kept in flight at once (default: 8).  Output
+    rows keep the input sample order.
 
 Notes
 -----
@@ -42,18 +45,32 @@ Notes
 
 import argparse
 import csv
-import json
 import math
 import os
 import sys
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional, TypedDict
+from typing import Dict, Iterable, Iterator, List, Optional, TypedDict
 
 import requests
-from natura.cache import DiskCache
+from natura.cache import BufferedCache, DiskCache
+from natura.http import build_session, concurrent_map
+from natura.io import ensure_dir, iter_geojson_features
 
 MAPILLARY_ENDPOINT = "https://graph.mapillary.com/images"
 
+FIELDNAMES = [
+    "sample_index",
+    "sample_lat",
+    "sample_lon",
+    "image_id",
+    "image_lat",
+    "image_lon",
+    "compass_angle",
+    "image_distance_m",
+]
+
 
 class Sample(TypedDict):
     index: int
@@ -62,11 +79,12 @@ class Sample(TypedDict):
 
 
 def load_samples(path: str) -> List[Sample]:
-    """Load sample points from a GeoJSON file, preserving feature order."""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    """Load sample points from a GeoJSON file, preserving feature order.
+
+    Both FeatureCollection and newline-delimited GeoJSON inputs are accepted.
+    """
     samples: List[Sample] = []
-    for idx, feature in enumerate(data.get("features", [])):
+    for idx, feature in enumerate(iter_geojson_features(path)):
         geom = feature.get("geometry", {})
         if geom.get("type") != "Point":
             continue
@@ -78,22 +96,38 @@ def load_samples(path: str) -> List[Sample]:
     return samples
 
 
-def make_session(token: str) -> requests.Session:
-    """Create a requests session with the Mapillary OAuth header."""
-    s = requests.Session()
-    s.headers.update({
-        "Authorization": f"OAuth {token}",
-        "User-Agent": "natura-scenic-mvp/0.1",
-        "Accept": "application/json",
-    })
-    return s
+def make_session(token: str, pool_size: int = 10) -> requests.Session:
+    """Create a requests session with the Mapillary OAuth header.
+
+    ``pool_size`` bounds the number of keep-alive connections; it should be at
+    least the number of concurrent requests.  Rate limited (429) and
+    transient 5xx responses are retried with exponential backoff.
+    """
+    return build_session(
+        retries=5,
+        backoff_factor=0.5,
+        allowed_methods=("GET",),
+        pool_size=pool_size,
+        headers={
+            "Authorization": f"OAuth {token}",
+            "User-Agent": "natura-scenic-mvp/0.1",
+            "Accept": "application/json",
+        },
+    )
+
+
+@lru_cache(maxsize=4096)
+def _meters_per_lon_degree(lat: float) -> float:
+    # Grid samples share latitudes along each row, so the cosine is computed
+    # once per distinct latitude instead of once per sample.
+    return 111_320.0 * max(0.0001, math.cos(math.radians(lat)))
 
 
 def meters_to_bbox(lat: float, lon: float, radius_m: float):
     """Return (minLon, minLat, maxLon, maxLat) bbox ~radius_m around (lat,lon)."""
     # Simple equirectangular-ish conversion; good enough for small radii
     dlat = radius_m / 111_320.0
-    dlon = radius_m / (111_320.0 * max(0.0001, math.cos(math.radians(lat))))
+    dlon = radius_m / _meters_per_lon_degree(lat)
     return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
 
 
@@ -159,10 +193,69 @@ def query_mapillary(sess: requests.Session, lat: float, lon: float, radius: int,
     }
 
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+def lookup_sample(
+    sess: requests.Session,
+    sample: Sample,
+    radius: int,
+    cache: Optional[DiskCache] = None,
+    verbose: bool = False,
+) -> Optional[Dict[str, float]]:
+    """Return the nearest-image metadata for one sample, using the cache if given."""
+    lat, lon = sample["lat"], sample["lon"]
+    cache_key = None
+    cached_entry = None
+    if cache is not None:
+        cache_key = DiskCache.key_from_mapping(
+            {
+                "lat": round(lat, 6),
+                "lon": round(lon, 6),
+                "radius": radius,
+            }
+        )
+        cached_entry = cache.load(cache_key)
+
+    if cached_entry is not None:
+        return (cached_entry or {}).get("value")
+    meta = query_mapillary(sess, lat, lon, radius, verbose=verbose)
+    if cache is not None and cache_key is not None:
+        cache.save(cache_key, {"value": meta})
+    return meta
+
+
+def build_row(sample: Sample, meta: Optional[Dict[str, float]]) -> Dict[str, object]:
+    """Build an output CSV row (see ``FIELDNAMES``) for a sample and its match."""
+    return {
+        "sample_index": sample["index"],
+        "sample_lat": sample["lat"],
+        "sample_lon": sample["lon"],
+        "image_id": (meta or {}).get("id", ""),
+        "image_lat": (meta or {}).get("lat", ""),
+        "image_lon": (meta or {}).get("lon", ""),
+        "compass_angle": (meta or {}).get("compass_angle", ""),
+        "image_distance_m": (meta or {}).get("distance_m", ""),
+    }
+
+
+def query_samples(
+    sess: requests.Session,
+    samples: Iterable[Sample],
+    radius: int,
+    cache: Optional[DiskCache] = None,
+    verbose: bool = False,
+    concurrency: int = 1,
+) -> Iterator[Dict[str, object]]:
+    """Yield one output row per sample, in input order.
+
+    This is the in-process entry point used by ``03_5_mapillary_two_pass.py``;
+    rows have the same keys as the CSV written by :func:`main`.  With
+    ``concurrency`` > 1 up to that many lookups run in a thread pool (the
+    work is network bound); samples are submitted in bounded batches so the
+    number of pending futures stays small.
+    """
+    def _lookup(sample: Sample) -> Dict[str, object]:
+        return build_row(sample, lookup_sample(sess, sample, radius, cache=cache, verbose=verbose))
+
+    return concurrent_map(_lookup, samples, concurrency)
 
 
 def print_progress(completed: int, total: int) -> None:
@@ -212,6 +305,12 @@ def main() -> None:
         action="store_true",
         help="Print extra debugging info for missing results / request errors",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent Mapillary requests (default: 8; 1 = sequential)",
+    )
     parser.add_argument(
         "--cache-dir",
         type=str,
@@ -244,16 +343,7 @@ def main() -> None:
     samples_to_process = samples[:limit]
     num_samples = len(samples_to_process)
 
-    fieldnames = [
-        "sample_index",
-        "sample_lat",
-        "sample_lon",
-        "image_id",
-        "image_lat",
-        "image_lon",
-        "compass_angle",
-        "image_distance_m",
-    ]
+    fieldnames = FIELDNAMES
 
     ensure_dir(args.output)
 
@@ -264,57 +354,46 @@ def main() -> None:
         print(f"No samples to process; wrote header to {args.output}")
         return
 
-    sess = make_session(token)
+    concurrency = max(1, args.concurrency)
+    sess = make_session(token, pool_size=max(10, concurrency))
     progress_enabled = sys.stdout.isatty()
     progress_step = max(1, num_samples // 20)
     matches = 0
 
-    cache: Optional[DiskCache] = None
+    cache: Optional[BufferedCache] = None
     if not args.no_cache:
         ttl = args.cache_ttl if args.cache_ttl > 0 else None
-        cache = DiskCache(Path(args.cache_dir), namespace="mapillary_metadata", max_age=ttl)
-
-    with open(args.output, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for processed, sample in enumerate(samples_to_process, start=1):
-            lat, lon = sample["lat"], sample["lon"]
-            cache_key = None
-            cached_entry = None
-            if cache is not None:
-                cache_key = DiskCache.key_from_mapping(
-                    {
-                        "lat": round(lat, 6),
-                        "lon": round(lon, 6),
-                        "radius": args.radius,
-                    }
-                )
-                cached_entry = cache.load(cache_key)
-
-            if cached_entry is not None:
-                meta = (cached_entry or {}).get("value")
-            else:
-                meta = query_mapillary(sess, lat, lon, args.radius, verbose=args.verbose)
-                if cache is not None and cache_key is not None:
-                    cache.save(cache_key, {"value": meta})
-            if meta:
-                matches += 1
-            row = {
-                "sample_index": sample["index"],
-                "sample_lat": lat,
-                "sample_lon": lon,
-                "image_id": (meta or {}).get("id", ""),
-                "image_lat": (meta or {}).get("lat", ""),
-                "image_lon": (meta or {}).get("lon", ""),
-                "compass_angle": (meta or {}).get("compass_angle", ""),
-                "image_distance_m": (meta or {}).get("distance_m", ""),
-            }
-            writer.writerow(row)
-            if progress_enabled:
-                print_progress(processed, num_samples)
-            elif processed % progress_step == 0 or processed == num_samples:
-                print(f"Processed {processed}/{num_samples} samples")
+        # Misses are written back in batches rather than one file per request.
+        cache = BufferedCache(DiskCache(Path(args.cache_dir), namespace="mapillary_metadata", max_age=ttl))
+
+    # Rows always carry exactly FIELDNAMES, so a plain writer fed by an
+    # itemgetter skips DictWriter's per-row key checks; a 1 MiB buffer
+    # batches the small row writes.
+    row_values = itemgetter(*fieldnames)
+    try:
+        with open(args.output, "w", newline="", encoding="utf-8", buffering=1 << 20) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
+
+            rows = query_samples(
+                sess,
+                samples_to_process,
+                args.radius,
+                cache=cache,
+                verbose=args.verbose,
+                concurrency=concurrency,
+            )
+            for processed, row in enumerate(rows, start=1):
+                if row["image_id"]:
+                    matches += 1
+                writer.writerow(row_values(row))
+                if progress_enabled:
+                    print_progress(processed, num_samples)
+                elif processed % progress_step == 0 or processed == num_samples:
+                    print(f"Processed {processed}/{num_samples} samples")
+    finally:
+        if cache is not None:
+            cache.flush()
 
     print(f"Metadata written to {args.output}; matched {matches} images out of {num_samples} samples")
 
@@ -24,17 +24,32 @@ Notes
 Mapillary imposes rate limits on API requests.  If you download a large
 number of images, you may need to add delays or implement caching.  This
 script is designed for small batches typical of an MVP evaluation.
+
+Up to ``--concurrency`` images (default: 8) are fetched at once; each one
+is a Graph API lookup followed by the thumbnail download, run in a thread
+pool over one shared keep-alive session.  Lower it if you hit rate limits.
+
+Thumbnail URLs returned by the Graph API are cached on disk (see
+``--cache-dir``/``--cache-ttl``/``--no-cache``), so re-runs skip the lookup.
+If a cached URL no longer downloads, a fresh one is requested once.
 """
 
 import argparse
 import csv
 import os
 import sys
-from typing import List, Dict
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Optional, Set
 
 import requests
 
+from natura.cache import DiskCache
+from natura.http import build_session, concurrent_map
+
 GRAPH_ENDPOINT_TEMPLATE = "https://graph.mapillary.com/{id}"
+# 1024px thumbnails are ~100-300 KB; read them in a few large chunks.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def read_image_ids(csv_path: str) -> List[str]:
@@ -49,7 +64,16 @@ def read_image_ids(csv_path: str) -> List[str]:
     return list(dict.fromkeys(ids))  # preserve order and uniqueness
 
 
-def get_thumbnail_url(image_id: str, token: str) -> str:
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Create a session whose connection pool can serve ``pool_size`` threads.
+
+    Rate limited (429) and transient 5xx responses are retried with
+    exponential backoff.
+    """
+    return build_session(retries=5, backoff_factor=0.5, allowed_methods=("GET",), pool_size=pool_size)
+
+
+def get_thumbnail_url(sess: requests.Session, image_id: str, token: str) -> str:
     """Retrieve the thumbnail URL for a Mapillary image via the Graph API.
 
     The Graph API returns a JSON object containing the field
@@ -61,7 +85,7 @@ def get_thumbnail_url(image_id: str, token: str) -> str:
         "access_token": token,
     }
     try:
-        resp = requests.get(endpoint, params=params)
+        resp = sess.get(endpoint, params=params)
     except Exception as exc:
         print(f"Error requesting thumbnail for {image_id}: {exc}", file=sys.stderr)
         return ""
@@ -75,13 +99,13 @@ def get_thumbnail_url(image_id: str, token: str) -> str:
     return data.get("thumb_1024_url", "")
 
 
-def download_image(url: str, dest_path: str) -> bool:
+def download_image(sess: requests.Session, url: str, dest_path: str) -> bool:
     """Download an image from a URL and write it to dest_path.
 
     Returns ``True`` on success, ``False`` otherwise.
     """
     try:
-        resp = requests.get(url, stream=True)
+        resp = sess.get(url, stream=True)
     except Exception as exc:
         print(f"Error downloading {url}: {exc}", file=sys.stderr)
         return False
@@ -91,16 +115,112 @@ def download_image(url: str, dest_path: str) -> bool:
             file=sys.stderr,
         )
         return False
-    with open(dest_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+    # Write to a per-thread temp file and rename, so an interrupted download
+    # never leaves a truncated JPEG that later runs would skip.
+    tmp_path = f"{dest_path}.{threading.get_ident()}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except requests.RequestException as exc:
+        print(f"Error downloading {url}: {exc}", file=sys.stderr)
+        return False
+    finally:
+        # Drop the partial file if the stream or the write failed.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return True
 
 
+def lookup_thumbnail_url(
+    sess: requests.Session,
+    image_id: str,
+    token: str,
+    cache: Optional[DiskCache] = None,
+    refresh: bool = False,
+) -> str:
+    """Return the thumbnail URL for ``image_id``, using the cache if given.
+
+    ``refresh`` bypasses a cached entry (e.g. when its URL stopped working).
+    """
+    if cache is not None and not refresh:
+        cached_entry = cache.load(image_id)
+        if cached_entry is not None:
+            return (cached_entry or {}).get("value", "")
+    url = get_thumbnail_url(sess, image_id, token)
+    if cache is not None and url:
+        cache.save(image_id, {"value": url})
+    return url
+
+
+def fetch_image(
+    sess: requests.Session,
+    image_id: str,
+    token: str,
+    output_dir: str,
+    cache: Optional[DiskCache] = None,
+    skip_existing: bool = True,
+) -> bool:
+    """Download one thumbnail unless it already exists; ``True`` if fetched.
+
+    Pass ``skip_existing=False`` when the ids were already filtered against
+    the directory (see :func:`existing_image_ids`) to drop the per-id
+    ``stat`` call.
+    """
+    dest_path = os.path.join(output_dir, f"{image_id}.jpg")
+    if skip_existing and os.path.exists(dest_path):
+        return False
+    url = lookup_thumbnail_url(sess, image_id, token, cache=cache)
+    if not url:
+        return False
+    if download_image(sess, url, dest_path):
+        return True
+    if cache is None:
+        return False
+    # Cached thumbnail URLs are signed and can expire; retry once with a
+    # freshly issued one.
+    fresh_url = lookup_thumbnail_url(sess, image_id, token, cache=cache, refresh=True)
+    return bool(fresh_url) and fresh_url != url and download_image(sess, fresh_url, dest_path)
+
+
+def fetch_images(
+    sess: requests.Session,
+    ids: Iterable[str],
+    token: str,
+    output_dir: str,
+    cache: Optional[DiskCache] = None,
+    concurrency: int = 1,
+    skip_existing: bool = True,
+) -> Iterator[bool]:
+    """Yield :func:`fetch_image` results for ``ids`` in input order.
+
+    With ``concurrency`` > 1 up to that many images are in flight at once in
+    a thread pool; ids are submitted in bounded batches so the number of
+    pending futures stays small.
+    """
+    def _fetch(image_id: str) -> bool:
+        return fetch_image(sess, image_id, token, output_dir, cache=cache, skip_existing=skip_existing)
+
+    return concurrent_map(_fetch, ids, concurrency)
+
+
+def existing_image_ids(directory: str) -> Set[str]:
+    """Return the ids of ``<image_id>.jpg`` files already in ``directory``.
+
+    One ``os.scandir`` pass replaces a ``stat`` call per image id.
+    """
+    with os.scandir(directory) as entries:
+        return {
+            entry.name[:-4]
+            for entry in entries
+            if entry.name.endswith(".jpg") and entry.is_file()
+        }
+
+
 def ensure_dir(path: str) -> None:
-    if not os.path.exists(path):
-        os.makedirs(path, exist_ok=True)
+    os.makedirs(path, exist_ok=True)
 
 
 def print_progress(completed: int, total: int) -> None:
@@ -139,6 +259,29 @@ def main() -> None:
         default=None,
         help="Maximum number of images to download (for testing)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Images downloaded concurrently (default: 8; 1 = sequential)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default="data/cache",
+        help="Directory for cached thumbnail URLs (per image)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=14 * 24 * 3600,
+        help="Cache expiry in seconds (default: 14 days). Set to 0 for no expiry.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable caching Graph API thumbnail lookups",
+    )
     args = parser.parse_args()
 
     if not args.token:
@@ -155,17 +298,32 @@ def main() -> None:
         print("No images to download; exiting.")
         return
 
+    existing = existing_image_ids(args.output_dir)
+    ids = [image_id for image_id in ids if image_id not in existing]
+    if len(ids) < total:
+        print(f"Skipping {total - len(ids)} images already on disk")
+    total = len(ids)
+    if total == 0:
+        print("All thumbnails already downloaded; exiting.")
+        return
+
     progress_enabled = sys.stdout.isatty()
     progress_step = max(1, total // 20)
     downloaded = 0
 
-    for idx, image_id in enumerate(ids):
-        dest_path = os.path.join(args.output_dir, f"{image_id}.jpg")
-        if not os.path.exists(dest_path):
-            # Download only if the file is missing
-            url = get_thumbnail_url(image_id, args.token)
-            if url and download_image(url, dest_path):
-                downloaded += 1
+    concurrency = max(1, args.concurrency)
+    sess = make_session(pool_size=max(10, concurrency))
+    cache: Optional[DiskCache] = None
+    if not args.no_cache:
+        ttl = args.cache_ttl if args.cache_ttl > 0 else None
+        cache = DiskCache(Path(args.cache_dir), namespace="mapillary_graph", max_age=ttl)
+    # ``ids`` already excludes the images on disk.
+    results = fetch_images(
+        sess, ids, args.token, args.output_dir, cache=cache, concurrency=concurrency, skip_existing=False
+    )
+    for idx, fetched in enumerate(results):
+        if fetched:
+            downloaded += 1
         if progress_enabled:
             print_progress(idx + 1, total)
         elif (idx + 1) % progress_step == 0 or idx + 1 == total:
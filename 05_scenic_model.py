@@ -32,16 +32,50 @@ Usage
 The script expects JPEG images named ``<image_id>.jpg`` in the
 specified directory and a CSV mapping image IDs to their geographic
 locations and compass angles.
+
+Feature extraction (JPEG decode plus NumPy) is CPU bound; pass
+``--workers N`` to score images in N processes (0 uses every CPU).  Output
+rows keep the metadata order unless ``--unordered`` is given, which writes
+each batch as soon as it is scored.
+
+The scoring parameters are saved next to the output as
+``<output>.params.json``.  With ``--resume`` a rerun keeps the rows already
+in the output and only scores images missing from it, provided the
+parameters are unchanged.
 """
 
 import argparse
 import csv
+import io
 import os
-from typing import Dict, Tuple, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import numpy as np
 from PIL import Image
 
+from natura.io import ensure_dir, load_json, read_csv_columns, write_json
+
+try:
+    import numba
+except ImportError:  # optional dependency
+    numba = None  # type: ignore[assignment]
+
+# Images per task; their files are prefetched together before decoding.
+PREFETCH_BATCH = 32
+
+# Seconds between progress lines; reporting by time rather than by image
+# count keeps fast runs quiet and slow runs informative.
+PROGRESS_INTERVAL = 5.0
+
+# Images larger than this multiple of the target size are first shrunk with
+# Image.reduce before resampling (see Image.resize's ``reducing_gap``).
+RESIZE_REDUCING_GAP = 3.0
+
 
 def load_metadata(csv_path: str) -> Dict[str, Dict[str, float]]:
     """Load image metadata keyed by image_id.
@@ -51,43 +85,78 @@ def load_metadata(csv_path: str) -> Dict[str, Dict[str, float]]:
     from image_id to a dictionary of these values.
     """
     meta: Dict[str, Dict[str, float]] = {}
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            image_id = row.get("image_id")
-            if not image_id:
-                continue
-            lat = row.get("image_lat")
-            lon = row.get("image_lon")
-            angle = row.get("compass_angle")
-            meta[image_id] = {
-                "lat": float(lat) if lat else None,
-                "lon": float(lon) if lon else None,
-                "compass_angle": float(angle) if angle else None,
-            }
+    names = ("image_id", "image_lat", "image_lon", "compass_angle")
+    cols = read_csv_columns(csv_path, names)
+    for image_id, lat, lon, angle in zip(*(cols[name] for name in names)):
+        if not image_id:
+            continue
+        meta[image_id] = {
+            "lat": float(lat) if lat else None,
+            "lon": float(lon) if lon else None,
+            "compass_angle": float(angle) if angle else None,
+        }
     return meta
 
 
+def image_files(directory: str) -> Dict[str, str]:
+    """Map image id to path for every ``<image_id>.jpg`` file in ``directory``.
+
+    One ``os.scandir`` pass replaces a ``stat`` call per metadata row.  A
+    missing directory yields an empty mapping.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {
+                entry.name[:-4]: entry.path
+                for entry in entries
+                if entry.name.endswith(".jpg") and entry.is_file()
+            }
+    except FileNotFoundError:
+        return {}
+
+
+def _colorfulness(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> float:
+    """Colourfulness from signed (int16) channel planes.
+
+    Both opponent channels are written straight into one preallocated
+    ``(2, N)`` float64 buffer with in-place ufuncs, then all first moments
+    come from a single ``sum(axis=1)`` and the second moments from one BLAS
+    dot product per channel, so no further full-size temporaries are made.
+    """
+    n = r.size
+    opp = np.empty((2, n), dtype=np.float64)
+    rg, yb = opp
+    np.subtract(r.ravel(), g.ravel(), out=rg)  # rg = R - G
+    np.add(r.ravel(), g.ravel(), out=yb)  # yb = 0.5 * (R + G) - B
+    yb *= 0.5
+    yb -= b.ravel()
+    sum_rg, sum_yb = opp.sum(axis=1)
+    return _colorfulness_from_moments(n, sum_rg, float(rg @ rg), sum_yb, float(yb @ yb))
+
+
+def _colorfulness_from_moments(
+    n: int, sum_rg: float, sum_rg_sq: float, sum_yb: float, sum_yb_sq: float
+) -> float:
+    """Colourfulness from the sums and sums of squares of ``rg`` and ``yb``."""
+    mean_rg = sum_rg / n
+    mean_yb = sum_yb / n
+    var_rg = max(sum_rg_sq / n - mean_rg * mean_rg, 0.0)
+    var_yb = max(sum_yb_sq / n - mean_yb * mean_yb, 0.0)
+    std_root = np.sqrt(var_rg + var_yb)
+    mean_root = np.sqrt(mean_rg ** 2 + mean_yb ** 2)
+    return float(std_root + 0.3 * mean_root)
+
+
 def compute_colorfulness(arr: np.ndarray) -> float:
     """Compute the colourfulness metric of an image array.
 
     Based on the method by Hasler and Süsstrunk (2003).  See
     https://infoscience.epfl.ch/record/33994 for details.
     """
-    # Separate channels
-    (R, G, B) = arr[..., 0], arr[..., 1], arr[..., 2]
-    # Compute rg = R - G and yb = 0.5 * (R + G) - B
-    rg = R - G
-    yb = 0.5 * (R + G) - B
-    # Compute means and standard deviations
-    std_rg = np.std(rg)
-    std_yb = np.std(yb)
-    mean_rg = np.mean(rg)
-    mean_yb = np.mean(yb)
-    # Combine
-    std_root = np.sqrt(std_rg ** 2 + std_yb ** 2)
-    mean_root = np.sqrt(mean_rg ** 2 + mean_yb ** 2)
-    return std_root + 0.3 * mean_root
+    r = arr[..., 0].astype(np.int16)
+    g = arr[..., 1].astype(np.int16)
+    b = arr[..., 2].astype(np.int16)
+    return _colorfulness(r, g, b)
 
 
 def compute_pixel_ratios(
@@ -100,52 +169,225 @@ def compute_pixel_ratios(
     water_min_blue: int,
 ) -> Tuple[float, float, float]:
     """Compute vegetation, sky and water pixel ratios."""
-    r = arr[..., 0].astype(np.int32)
-    g = arr[..., 1].astype(np.int32)
-    b = arr[..., 2].astype(np.int32)
+    veg_ratio, sky_ratio, water_ratio, _ = compute_pixel_features(
+        arr, veg_delta, veg_min, sky_delta, sky_min, water_blue_delta, water_min_blue
+    )
+    return veg_ratio, sky_ratio, water_ratio
+
+
+def _pixel_stats_loop(
+    arr: np.ndarray,
+    veg_delta: int,
+    veg_min: int,
+    sky_delta: int,
+    sky_min: int,
+    water_blue_delta: int,
+    water_min_blue: int,
+) -> Tuple[int, int, int, int, int, int, int]:
+    """Count pixel classes and accumulate colourfulness moments in one pass.
+
+    Returns the vegetation, sky and water counts followed by the sum and
+    sum of squares of ``rg = R - G`` and of ``2 * yb = R + G - 2B`` (kept
+    doubled so every accumulator is an exact integer).  Plain per-pixel
+    loop with the same inequalities as the NumPy path; it is only fast once
+    compiled by numba (see ``_pixel_stats_jit``).
+
+    Pixels are widened to int32 explicitly: under numba ``int()`` of a uint8
+    element stays uint8, so ``g - max(r, b)`` would wrap around instead of
+    going negative.  The moments are int64 so large images cannot overflow.
+    """
+    veg = np.int64(0)
+    sky = np.int64(0)
+    water = np.int64(0)
+    sum_rg = np.int64(0)
+    sum_rg_sq = np.int64(0)
+    sum_yb2 = np.int64(0)
+    sum_yb2_sq = np.int64(0)
+    for i in range(arr.shape[0]):
+        for j in range(arr.shape[1]):
+            r = np.int32(arr[i, j, 0])
+            g = np.int32(arr[i, j, 1])
+            b = np.int32(arr[i, j, 2])
+            # Branch-free: every test adds 0 or 1, so the loop body is
+            # straight-line integer code LLVM can vectorise.
+            veg += (g > veg_min) & (g - max(r, b) > veg_delta)
+            sky += (b > sky_min) & (b - max(r, g) > sky_delta)
+            water += (b > water_min_blue) & (r < g) & (b - r > water_blue_delta)
+            rg = r - g
+            yb2 = r + g - 2 * b
+            sum_rg += rg
+            sum_rg_sq += rg * rg
+            sum_yb2 += yb2
+            sum_yb2_sq += yb2 * yb2
+    return veg, sky, water, sum_rg, sum_rg_sq, sum_yb2, sum_yb2_sq
+
+
+# With numba installed every per-pixel feature comes from one compiled pass
+# over the uint8 pixels instead of a dozen full-image NumPy temporaries.
+# Images are already spread over worker processes, so the kernel itself
+# stays single-threaded.
+if numba is not None:
+    _pixel_stats_jit = numba.njit(cache=True, nogil=True)(_pixel_stats_loop)
+else:
+    _pixel_stats_jit = None
+
+
+def _pixel_features_jit(
+    arr: np.ndarray,
+    veg_delta: int,
+    veg_min: int,
+    sky_delta: int,
+    sky_min: int,
+    water_blue_delta: int,
+    water_min_blue: int,
+) -> Tuple[float, float, float, float]:
+    """Pixel features from the compiled single pass :func:`_pixel_stats_loop`."""
+    total = arr.shape[0] * arr.shape[1]
+    veg, sky, water, sum_rg, sum_rg_sq, sum_yb2, sum_yb2_sq = _pixel_stats_jit(
+        arr, veg_delta, veg_min, sky_delta, sky_min, water_blue_delta, water_min_blue
+    )
+    colorfulness = _colorfulness_from_moments(
+        total, float(sum_rg), float(sum_rg_sq), 0.5 * float(sum_yb2), 0.25 * float(sum_yb2_sq)
+    )
+    return int(veg) / total, int(sky) / total, int(water) / total, colorfulness
+
+
+def _pixel_features_numpy(
+    arr: np.ndarray,
+    veg_delta: int,
+    veg_min: int,
+    sky_delta: int,
+    sky_min: int,
+    water_blue_delta: int,
+    water_min_blue: int,
+) -> Tuple[float, float, float, float]:
+    """Pixel features from int16 channel planes and NumPy masks.
+
+    An image too dark to pass any class's brightness floor has no class
+    pixels, so only its colourfulness is computed.
+    """
     total = arr.shape[0] * arr.shape[1]
+    r16 = arr[..., 0].astype(np.int16)
+    g16 = arr[..., 1].astype(np.int16)
+    b16 = arr[..., 2].astype(np.int16)
+    if int(g16.max()) <= veg_min and int(b16.max()) <= min(sky_min, water_min_blue):
+        return 0.0, 0.0, 0.0, _colorfulness(r16, g16, b16)
     # Vegetation: green significantly higher than red and blue
-    veg_mask = (g > r + veg_delta) & (g > b + veg_delta) & (g > veg_min)
+    veg_mask = (g16 - np.maximum(r16, b16)) > veg_delta
+    veg_mask &= g16 > veg_min
     # Sky: blue dominant, moderate brightness
-    sky_mask = (b > g + sky_delta) & (b > r + sky_delta) & (b > sky_min)
+    sky_mask = (b16 - np.maximum(r16, g16)) > sky_delta
+    sky_mask &= b16 > sky_min
     # Water: blue moderately high and green somewhat high relative to red
-    water_mask = (b > r + water_blue_delta) & (g > r) & (b > water_min_blue)
-    veg_ratio = float(np.sum(veg_mask)) / total
-    sky_ratio = float(np.sum(sky_mask)) / total
-    water_ratio = float(np.sum(water_mask)) / total
-    return veg_ratio, sky_ratio, water_ratio
+    water_mask = (b16 - r16) > water_blue_delta
+    water_mask &= r16 < g16
+    water_mask &= b16 > water_min_blue
+    # count_nonzero counts mask bytes directly, with no int64 widening.
+    veg_ratio = np.count_nonzero(veg_mask) / total
+    sky_ratio = np.count_nonzero(sky_mask) / total
+    water_ratio = np.count_nonzero(water_mask) / total
+    colorfulness = _colorfulness(r16, g16, b16)
+    return veg_ratio, sky_ratio, water_ratio, colorfulness
 
 
-def compute_features(
-    image_path: str,
-    resize: int,
-    colorfulness_norm: float,
+def compute_pixel_features(
+    arr: np.ndarray,
     veg_delta: int,
     veg_min: int,
     sky_delta: int,
     sky_min: int,
     water_blue_delta: int,
     water_min_blue: int,
-    weight_green: float,
-    weight_sky: float,
-    weight_water: float,
-    weight_color: float,
-) -> Optional[Dict[str, float]]:
-    """Compute the feature set for a single image.
+) -> Tuple[float, float, float, float]:
+    """Compute vegetation, sky and water ratios plus colourfulness in one go.
 
-    Returns a dictionary of features.  If the image cannot be processed,
-    ``None`` is returned.
+    Each channel is copied once into a contiguous int16 plane (half the
+    bytes of int32 and enough headroom for the differences); every mask is
+    then built from those planes, which is markedly faster than operating
+    on the strided uint8 channel views.  Each class compares one channel
+    against the larger of the other two (``g > r + d and g > b + d`` is
+    ``g - max(r, b) > d``) and each mask is counted with
+    ``np.count_nonzero``.  The colourfulness moments reuse the int16 planes,
+    and each mean/std pair comes from a single sum and dot product rather
+    than separate ``np.mean``/``np.std`` passes (see :func:`_colorfulness`).
+    When numba is available all of this is instead fused into the compiled
+    single pass :func:`_pixel_stats_loop`.
+
+    A grayscale image (all channels equal) has no colour and, with
+    non-negative deltas, no class pixels, so both paths are skipped and it
+    returns all zeros.  The NumPy path also skips the masks for an image too
+    dark to pass any class's brightness floor and only computes
+    colourfulness; the compiled pass needs no such shortcut, as its class
+    counts simply come out zero.
+    """
+    r = arr[..., 0]
+    g = arr[..., 1]
+    b = arr[..., 2]
+    if (
+        veg_delta >= 0
+        and sky_delta >= 0
+        and np.array_equal(r[0], g[0])  # first row rejects most colour images
+        and np.array_equal(r, g)
+        and np.array_equal(g, b)
+    ):
+        return 0.0, 0.0, 0.0, 0.0
+    thresholds = (veg_delta, veg_min, sky_delta, sky_min, water_blue_delta, water_min_blue)
+    if _pixel_stats_jit is not None:
+        return _pixel_features_jit(arr, *thresholds)
+    return _pixel_features_numpy(arr, *thresholds)
+
+
+def load_image_array(image_path: str, resize: int) -> Optional[np.ndarray]:
+    """Decode an image to a ``resize`` x ``resize`` RGB uint8 array.
+
+    Returns ``None`` (after reporting the error) if the image cannot be read.
     """
     try:
-        with Image.open(image_path) as im:
-            # Convert to RGB and resize to a fixed small size to speed up
-            im = im.convert("RGB")
-            im_small = im.resize((resize, resize))
-            arr = np.array(im_small)
+        # Read the whole file up front: the descriptor is released at once
+        # (useful when many decode threads are in flight) and the decoder
+        # then works from memory.
+        with open(image_path, "rb") as f:
+            data = f.read()
+        with Image.open(io.BytesIO(data)) as im:
+            # Let libjpeg decode straight at the smallest DCT scale (1/2,
+            # 1/4 or 1/8) that still covers the target size; full-size
+            # decoding is the dominant cost.  No-op for other formats.
+            im.draft("RGB", (resize, resize))
+            # Convert to RGB and resize to a fixed small size to speed up.
+            # Both return a fresh copy even when there is nothing to do, so
+            # they are skipped when the decoded image already matches;
+            # ``np.asarray`` then wraps Pillow's pixel bytes without a
+            # further copy.
+            if im.mode != "RGB":
+                im = im.convert("RGB")
+            if im.size != (resize, resize):
+                # reducing_gap lets formats draft() cannot shrink (PNG, WebP,
+                # ...) drop most pixels with a cheap box reduce before the
+                # bicubic pass; drafted JPEGs are already within 2x and are
+                # resampled exactly as before.
+                im = im.resize((resize, resize), reducing_gap=RESIZE_REDUCING_GAP)
+            return np.asarray(im)
     except Exception as exc:
         print(f"Failed to process {image_path}: {exc}")
         return None
-    veg_ratio, sky_ratio, water_ratio = compute_pixel_ratios(
+
+
+def compute_array_features(
+    arr: np.ndarray,
+    colorfulness_norm: float,
+    veg_delta: int,
+    veg_min: int,
+    sky_delta: int,
+    sky_min: int,
+    water_blue_delta: int,
+    water_min_blue: int,
+    weight_green: float,
+    weight_sky: float,
+    weight_water: float,
+    weight_color: float,
+) -> Dict[str, float]:
+    """Compute the feature set for an already decoded RGB image array."""
+    veg_ratio, sky_ratio, water_ratio, colorfulness = compute_pixel_features(
         arr,
         veg_delta=veg_delta,
         veg_min=veg_min,
@@ -154,7 +396,6 @@ def compute_features(
         water_blue_delta=water_blue_delta,
         water_min_blue=water_min_blue,
     )
-    colorfulness = compute_colorfulness(arr)
     # Normalize colorfulness by a typical range (observed approx 0-100)
     colorfulness_norm = colorfulness / max(colorfulness_norm, 1e-6)
     # Compute scenic score as weighted sum (tune weights as desired)
@@ -173,10 +414,184 @@ def compute_features(
     }
 
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+def compute_features(
+    image_path: str,
+    resize: int,
+    colorfulness_norm: float,
+    veg_delta: int,
+    veg_min: int,
+    sky_delta: int,
+    sky_min: int,
+    water_blue_delta: int,
+    water_min_blue: int,
+    weight_green: float,
+    weight_sky: float,
+    weight_water: float,
+    weight_color: float,
+) -> Optional[Dict[str, float]]:
+    """Compute the feature set for a single image.
+
+    Returns a dictionary of features.  If the image cannot be processed,
+    ``None`` is returned.
+    """
+    arr = load_image_array(image_path, resize)
+    if arr is None:
+        return None
+    return compute_array_features(
+        arr,
+        colorfulness_norm=colorfulness_norm,
+        veg_delta=veg_delta,
+        veg_min=veg_min,
+        sky_delta=sky_delta,
+        sky_min=sky_min,
+        water_blue_delta=water_blue_delta,
+        water_min_blue=water_min_blue,
+        weight_green=weight_green,
+        weight_sky=weight_sky,
+        weight_water=weight_water,
+        weight_color=weight_color,
+    )
+
+
+def prefetch_files(paths: Iterable[str]) -> None:
+    """Ask the kernel to start reading ``paths`` into the page cache.
+
+    ``posix_fadvise(WILLNEED)`` queues asynchronous readahead and returns
+    immediately, so the reads of later files overlap with decoding the
+    current one.  A no-op where the call is unavailable (e.g. Windows).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def score_image(item: Tuple[str, str], params: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, float]]]:
+    """Score one ``(image_id, image_path)`` pair with :func:`compute_features`.
+
+    Kept at module level so it can be dispatched to worker processes.
+    """
+    image_id, image_path = item
+    return image_id, compute_features(image_path, **params)
+
+
+def score_batch(
+    batch: List[Tuple[str, str]], params: Dict[str, Any], decode_threads: int = 1
+) -> List[Tuple[str, Optional[Dict[str, float]]]]:
+    """Prefetch a batch of images, then score them in order.
+
+    With ``decode_threads`` > 1 the images are read and decoded by a small
+    thread pool running ahead of the scoring loop, so file I/O and JPEG
+    decoding (which release the GIL) overlap with the NumPy work.
+    """
+    prefetch_files(path for _, path in batch)
+    if decode_threads <= 1 or len(batch) < 2:
+        return [score_image(item, params) for item in batch]
+    array_params = dict(params)
+    load = partial(load_image_array, resize=array_params.pop("resize"))
+    with ThreadPoolExecutor(max_workers=decode_threads) as pool:
+        arrays = pool.map(load, (path for _, path in batch))
+        return [
+            (image_id, None if arr is None else compute_array_features(arr, **array_params))
+            for (image_id, _), arr in zip(batch, arrays)
+        ]
+
+
+# Scoring settings installed once per worker process by ``_init_worker``
+# so they are not pickled again with every batch.
+_WORKER_PARAMS: Dict[str, Any] = {}
+_WORKER_DECODE_THREADS = 1
+
+
+def _init_worker(params: Dict[str, Any], decode_threads: int) -> None:
+    global _WORKER_PARAMS, _WORKER_DECODE_THREADS
+    _WORKER_PARAMS = params
+    _WORKER_DECODE_THREADS = decode_threads
+
+
+def _score_batch_in_worker(
+    batch: List[Tuple[str, str]]
+) -> List[Tuple[str, Optional[Dict[str, float]]]]:
+    return score_batch(batch, _WORKER_PARAMS, _WORKER_DECODE_THREADS)
+
+
+def iter_image_features(
+    items: Iterable[Tuple[str, str]],
+    params: Dict[str, Any],
+    workers: int = 1,
+    ordered: bool = True,
+    decode_threads: int = 1,
+) -> Iterator[Tuple[str, Optional[Dict[str, float]]]]:
+    """Yield ``(image_id, features)`` for each item.
+
+    Items are scored in batches of ``PREFETCH_BATCH``; each batch's files
+    are handed to the kernel for readahead before the first one is decoded.
+    With ``workers`` > 1 batches are scored in a process pool, which also
+    amortises pickling overhead across many images.  Results follow input
+    order unless ``ordered`` is false, in which case each batch is yielded
+    as soon as it finishes so one slow batch never holds back the rest.
+    ``decode_threads`` is passed on to :func:`score_batch`.
+    """
+    it = iter(items)
+    batches = iter(lambda: list(islice(it, PREFETCH_BATCH)), [])
+    if workers > 1:
+        with Pool(workers, initializer=_init_worker, initargs=(params, decode_threads)) as pool:
+            imap = pool.imap if ordered else pool.imap_unordered
+            for results in imap(_score_batch_in_worker, batches):
+                yield from results
+    else:
+        worker = partial(score_batch, params=params, decode_threads=decode_threads)
+        for results in map(worker, batches):
+            yield from results
+
+
+def _params_path(output_path: str) -> str:
+    """Sidecar file recording the scoring parameters used for ``output_path``."""
+    return f"{output_path}.params.json"
+
+
+def _drop_partial_row(path: str) -> None:
+    """Truncate ``path`` after its last newline (drops a row cut off mid-write)."""
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        start = max(0, size - 65536)
+        f.seek(start)
+        tail = f.read()
+        if tail.endswith(b"\n"):
+            return
+        cut = tail.rfind(b"\n")
+        f.truncate(start + cut + 1 if cut >= 0 else 0)
+
+
+def completed_image_ids(output_path: str, params: Dict[str, Any]) -> Set[str]:
+    """Return the image ids already scored in ``output_path`` with ``params``.
+
+    An empty set (no usable previous output, or it was produced with other
+    scoring parameters) means the output has to be written from scratch.
+    """
+    params_path = _params_path(output_path)
+    if not (os.path.isfile(output_path) and os.path.isfile(params_path)):
+        return set()
+    try:
+        previous = load_json(params_path)
+    except (OSError, ValueError):
+        return set()
+    if previous != params:
+        print("Scoring parameters changed since the previous run; rescoring every image")
+        return set()
+    _drop_partial_row(output_path)
+    return {image_id for image_id in read_csv_columns(output_path, ("image_id",))["image_id"] if image_id}
 
 
 def main() -> None:
@@ -221,61 +636,104 @@ def main() -> None:
     parser.add_argument("--weight-sky", type=float, default=0.3, help="Weight for sky ratio")
     parser.add_argument("--weight-water", type=float, default=0.2, help="Weight for water ratio")
     parser.add_argument("--weight-color", type=float, default=0.1, help="Weight for colorfulness")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for feature extraction (default: 1; 0 = all CPUs)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Write rows as soon as each batch is scored instead of in metadata order",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=4,
+        help="Threads per process reading and decoding images ahead of scoring (default: 4)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Keep rows already in --output and only score the remaining images "
+        "(starts over if the scoring parameters changed)",
+    )
     args = parser.parse_args()
 
     metadata = load_metadata(args.metadata)
     image_ids = list(metadata.keys())
     total = len(image_ids)
+    fieldnames = [
+        "image_id",
+        "lat",
+        "lon",
+        "compass_angle",
+        "green_ratio",
+        "sky_ratio",
+        "water_ratio",
+        "colorfulness",
+        "scenic_score",
+    ]
+    params = {
+        "resize": args.resize,
+        "colorfulness_norm": args.colorfulness_norm,
+        "veg_delta": args.veg_delta,
+        "veg_min": args.veg_min,
+        "sky_delta": args.sky_delta,
+        "sky_min": args.sky_min,
+        "water_blue_delta": args.water_blue_delta,
+        "water_min_blue": args.water_min_blue,
+        "weight_green": args.weight_green,
+        "weight_sky": args.weight_sky,
+        "weight_water": args.weight_water,
+        "weight_color": args.weight_color,
+    }
+    done = completed_image_ids(args.output, params) if args.resume else set()
+    if done:
+        image_ids = [image_id for image_id in image_ids if image_id not in done]
+        print(f"Resuming: {total - len(image_ids)} images already scored in {args.output}")
+        total = len(image_ids)
     print(f"Computing features for {total} images")
     ensure_dir(args.output)
-    with open(args.output, "w", newline="", encoding="utf-8") as f:
-        fieldnames = [
-            "image_id",
-            "lat",
-            "lon",
-            "compass_angle",
-            "green_ratio",
-            "sky_ratio",
-            "water_ratio",
-            "colorfulness",
-            "scenic_score",
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+    # A 1 MiB buffer batches the small row writes.
+    with open(args.output, "a" if done else "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        if not done:
+            writer.writerow(fieldnames)
+            write_json(_params_path(args.output), params)
+        available = image_files(args.images_dir)
+        items = [(image_id, available[image_id]) for image_id in image_ids if image_id in available]
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
         processed = 0
-        for image_id in image_ids:
-            img_path = os.path.join(args.images_dir, f"{image_id}.jpg")
-            if not os.path.isfile(img_path):
-                continue
-            features = compute_features(
-                img_path,
-                resize=args.resize,
-                colorfulness_norm=args.colorfulness_norm,
-                veg_delta=args.veg_delta,
-                veg_min=args.veg_min,
-                sky_delta=args.sky_delta,
-                sky_min=args.sky_min,
-                water_blue_delta=args.water_blue_delta,
-                water_min_blue=args.water_min_blue,
-                weight_green=args.weight_green,
-                weight_sky=args.weight_sky,
-                weight_water=args.weight_water,
-                weight_color=args.weight_color,
-            )
+        next_report = time.monotonic() + PROGRESS_INTERVAL
+        features_iter = iter_image_features(
+            items, params, workers=workers, ordered=not args.unordered, decode_threads=args.decode_threads
+        )
+        for image_id, features in features_iter:
             if features is None:
                 continue
             meta = metadata[image_id]
-            row = {
-                "image_id": image_id,
-                "lat": meta.get("lat"),
-                "lon": meta.get("lon"),
-                "compass_angle": meta.get("compass_angle"),
-            }
-            row.update(features)
-            writer.writerow(row)
+            # Emit the row as a tuple in ``fieldnames`` order.
+            writer.writerow(
+                (
+                    image_id,
+                    meta.get("lat"),
+                    meta.get("lon"),
+                    meta.get("compass_angle"),
+                    features["green_ratio"],
+                    features["sky_ratio"],
+                    features["water_ratio"],
+                    features["colorfulness"],
+                    features["scenic_score"],
+                )
+            )
             processed += 1
-            if processed % 50 == 0:
+            now = time.monotonic()
+            if now >= next_report:
                 print(f"Processed {processed}/{total} images")
+                next_report = now + PROGRESS_INTERVAL
+    print(f"Processed {processed}/{total} images")
     print(f"Feature CSV written to {args.output}")
 
 
@@ -40,17 +40,12 @@ this alignment remains valid.
 import argparse
 import csv
 import json
-import os
 from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List
 
 from natura.heatmap import iter_heatmap_points, write_heatmap
-
-def load_geojson(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
+from natura.io import ensure_dir, load_geojson
 
 def load_metadata(csv_path: str) -> List[Dict[str, str]]:
     rows = []
@@ -76,12 +71,6 @@ def load_image_scores(csv_path: str) -> Dict[str, float]:
     return scores
 
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
-
-
 def main() -> None:
     parser = argparse.ArgumentParser(description="Aggregate scenic scores to road edges")
     parser.add_argument("--roads", type=str, required=True, help="Roads GeoJSON from step 1")
@@ -11,58 +11,46 @@ image-level scenic scores and writes:
 """
 
 import argparse
-import csv
-import json
-import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from natura.heatmap import write_heatmap
-
-
-def load_geojson(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def load_metadata(csv_path: str) -> Dict[int, Dict[str, str]]:
-    rows: Dict[int, Dict[str, str]] = {}
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            idx = row.get("sample_index")
-            if idx is None:
-                continue
-            try:
-                rows[int(idx)] = row
-            except ValueError:
-                continue
+from natura.io import ensure_dir, iter_geojson_features, read_csv_columns, write_feature_collection
+
+
+def load_metadata(csv_path: str) -> Dict[int, Dict[str, Any]]:
+    """Map ``sample_index`` to that row's ``image_id`` and ``image_distance_m``.
+
+    Distances are parsed here, once per row, so they arrive as ``float`` (or
+    ``None`` when blank or malformed) and the scoring loop does no parsing.
+    """
+    rows: Dict[int, Dict[str, Any]] = {}
+    cols = read_csv_columns(csv_path, ("sample_index", "image_id", "image_distance_m"))
+    for idx, image_id, distance in zip(cols["sample_index"], cols["image_id"], cols["image_distance_m"]):
+        if idx is None:
+            continue
+        try:
+            idx = int(idx)
+        except ValueError:
+            continue
+        rows[idx] = {"image_id": image_id, "image_distance_m": parse_float(distance)}
     return rows
 
 
 def load_image_scores(csv_path: str) -> Dict[str, float]:
     scores = {}
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            image_id = row.get("image_id")
-            score = row.get("scenic_score")
-            if image_id and score is not None:
-                try:
-                    scores[image_id] = float(score)
-                except ValueError:
-                    continue
+    cols = read_csv_columns(csv_path, ("image_id", "scenic_score"))
+    for image_id, score in zip(cols["image_id"], cols["scenic_score"]):
+        if image_id and score is not None:
+            try:
+                scores[image_id] = float(score)
+            except ValueError:
+                continue
     return scores
 
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
-    if value is None or value == "":
+    if not value:
         return None
     try:
         return float(value)
@@ -70,6 +58,56 @@ def parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
+def iter_scored_features(
+    samples: Iterable[Dict[str, Any]],
+    metadata_rows: Dict[int, Dict[str, Any]],
+    image_scores: Dict[str, float],
+    max_dist: Optional[float],
+    heatmap_points: List[Tuple[float, float, float]],
+) -> Iterator[Dict[str, Any]]:
+    """Attach scores to each sample feature and yield it.
+
+    ``(lat, lon, score)`` of every scored point is appended to
+    ``heatmap_points`` as the features are produced.
+    """
+    # Bind the per-feature lookups and appends once outside the loop.
+    get_meta = metadata_rows.get
+    get_score = image_scores.get
+    add_heatmap_point = heatmap_points.append
+
+    for idx, feature in enumerate(samples):
+        props = feature.get("properties")
+        if props is None:
+            props = feature["properties"] = {}
+        meta = get_meta(idx)
+        if meta is None:
+            image_id = None
+            image_distance = None
+        else:
+            image_id = meta["image_id"] or None
+            image_distance = meta["image_distance_m"]
+        score = get_score(image_id) if image_id else None
+
+        if max_dist is not None and image_distance is not None and image_distance > max_dist:
+            score = None
+
+        if score is not None:
+            props["scenic_score"] = float(score)
+            props["n_samples"] = 1
+            props["image_id"] = image_id
+            props["image_distance_m"] = image_distance
+            coords = feature.get("geometry", {}).get("coordinates", [])
+            if len(coords) >= 2:
+                lon, lat = coords[:2]
+                add_heatmap_point((lat, lon, float(score)))
+        else:
+            props["scenic_score"] = None
+            props["n_samples"] = 0
+            props["image_id"] = image_id
+            props["image_distance_m"] = image_distance
+        yield feature
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Attach scenic scores to grid samples")
     parser.add_argument("--samples", type=str, required=True, help="Grid samples GeoJSON (from 02_grid_samples.py)")
@@ -95,45 +133,22 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    samples = load_geojson(args.samples).get("features", [])
     metadata_rows = load_metadata(args.metadata)
     image_scores = load_image_scores(args.image_scores)
 
-    scored_points = []
-    heatmap_points = []
+    heatmap_points: List[Tuple[float, float, float]] = []
     max_dist = args.max_image_distance if args.max_image_distance and args.max_image_distance > 0 else None
 
-    for idx, feature in enumerate(samples):
-        props = feature.setdefault("properties", {})
-        meta = metadata_rows.get(idx)
-        image_id = (meta or {}).get("image_id") or None
-        image_distance = parse_float((meta or {}).get("image_distance_m"))
-        score = image_scores.get(image_id) if image_id else None
-
-        if max_dist is not None and image_distance is not None and image_distance > max_dist:
-            score = None
-
-        if score is not None:
-            props["scenic_score"] = float(score)
-            props["n_samples"] = 1
-            props["image_id"] = image_id
-            props["image_distance_m"] = image_distance
-            coords = feature.get("geometry", {}).get("coordinates", [])
-            if len(coords) >= 2:
-                lon, lat = coords[:2]
-                heatmap_points.append((lat, lon, float(score)))
-            scored_points.append(feature)
-        else:
-            props["scenic_score"] = None
-            props["n_samples"] = 0
-            props["image_id"] = image_id
-            props["image_distance_m"] = image_distance
-            scored_points.append(feature)
-
-    out = {"type": "FeatureCollection", "features": scored_points}
     ensure_dir(args.output)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(out, f)
+    # Features are scored and serialised one at a time, so neither the input
+    # samples (when NDJSON) nor the output collection is ever held
+    # in memory as a whole.
+    write_feature_collection(
+        args.output,
+        iter_scored_features(
+            iter_geojson_features(args.samples), metadata_rows, image_scores, max_dist, heatmap_points
+        ),
+    )
     print(f"Wrote scored grid to {args.output} ({len(heatmap_points)} scored points)")
 
     if args.heatmap_output and heatmap_points:
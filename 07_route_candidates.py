@@ -31,6 +31,15 @@ Parameters
 --step:
     Sampling interval in metres for computing route scenicness.  Default
     is 100 m.
+--concurrency:
+    Number of OSRM route requests in flight at once (default 8).  The
+    alternatives request and the waypoint requests are sent together.
+    All requests share one keep-alive session that retries rate limited
+    and transient errors.
+--cache-dir, --cache-ttl, --no-cache:
+    Disk cache for OSRM responses.  The road anchors and dead-end nodes
+    derived from ``--roads`` are cached there too, keyed by the roads
+    file's size and modification time.
 --output:
     Path to write the routes as a GeoJSON FeatureCollection.  Each
     route feature includes the OSRM properties (duration, distance)
@@ -39,24 +48,42 @@ Parameters
 Notes
 -----
 This script relies on OSRM and will not function without internet
-connectivity or a local OSRM instance. It also uses a naive nearest
-neighbour search to match route sample points to scenic points; this
-works for small test areas but does not scale to large networks. In a
-real system you would use a spatial index (e.g. an R-tree) for
-efficiency.
+connectivity or a local OSRM instance. Route sample points are matched
+to scenic points with a KD-tree when SciPy is installed and with a tiled
+brute-force scan otherwise, which is fine for small test areas but does
+not scale to large networks.
 """
 
 import argparse
-import json
+import hashlib
 import os
 import requests
 import math
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import Callable, List, Tuple, Dict, Optional, Union
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
+import numpy as np
+
 from natura.cache import DiskCache
+from natura.geo import haversine_m_array
 from natura.heatmap import load_heatmap
+from natura.http import build_session, concurrent_map
+from natura.io import ensure_dir, iter_geojson_features, write_json
+
+try:
+    import numba
+except ImportError:  # optional dependency
+    numba = None  # type: ignore[assignment]
+
+_prange = numba.prange if numba is not None else range
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # optional dependency
+    cKDTree = None  # type: ignore[assignment]
 
 ROAD_CLASS_WEIGHTS = {
     "motorway": 0.55,
@@ -71,19 +98,41 @@ ROAD_CLASS_WEIGHTS = {
     "track": 1.05,
 }
 DEFAULT_ROAD_WEIGHT = 1.0
-
-def build_osrm_url(
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+# Candidate lists at least this long are scanned with NumPy per sample; the
+# scalar loop is cheaper for a handful of points.
+VECTOR_MIN_CANDIDATES = 32
+# Sample x candidate pairs evaluated per NumPy block in route scoring.  Each
+# float64 temporary stays around 512 KB, small enough to remain in cache;
+# larger blocks measured slower.
+PAIR_BLOCK_ELEMENTS = 1 << 16
+# Candidates per tile in route scoring.  The unit vectors of a tile take
+# 96 KB, so a tile stays in L2 while every sample block is matched against
+# it, and the per-block temporaries no longer grow with the number of
+# candidates.
+CANDIDATE_TILE = 4096
+# Candidates whose unit-vector dot product with a sample lies within this
+# margin of the largest one are re-ranked with the exact haversine term.
+# A float64 dot product of unit vectors is off by a few 1e-16, so this keeps
+# the true nearest among them; near a sample the margin is millimetres.
+DOT_TOLERANCE = 2e-15
+# KD-tree matches whose chord lengths lie within this margin of a sample's
+# nearest are re-ranked with the exact haversine term (about 6 um on Earth).
+CHORD_TOLERANCE = 1e-12
+
+@lru_cache(maxsize=64)
+def _osrm_url_parts(
     base_endpoint: str,
-    coords: List[Tuple[float, float]],   # [(lat, lon), ...]
-    profile: str = "driving",
-    extra_params: Optional[Dict[str, str]] = None,
-) -> str:
-    """
-    Merge any existing query string in base_endpoint with extra_params,
-    ensure the route path is present, and append coordinates.
+    profile: str,
+    extra_items: Tuple[Tuple[str, str], ...],
+) -> Tuple[str, str]:
+    """Return the URL text before and after the coordinate list.
+
+    Parsing the endpoint and merging its query only depends on the endpoint,
+    profile and extra parameters, which stay the same for a whole run, so
+    the result is cached and each request just splices in its coordinates.
     """
-    extra_params = extra_params or {}
-
     p = urlparse(base_endpoint)
 
     # Ensure path includes /route/v1/{profile}
@@ -92,35 +141,79 @@ def build_osrm_url(
     if needed not in path:
         path = path + needed
 
-    # Append lon,lat;lon,lat...
-    coord_str = ";".join([f"{lon},{lat}" for lat, lon in coords])
-    path = f"{path}/{coord_str}"
-
     # Merge existing query with extra params
     q = dict(parse_qsl(p.query))
-    q.update(extra_params)
+    q.update(extra_items)
 
-    return urlunparse(p._replace(path=path, query=urlencode(q)))
+    # Split the assembled URL around a placeholder coordinate list.
+    marker = "\x00"
+    url = urlunparse(p._replace(path=f"{path}/{marker}", query=urlencode(q)))
+    head, tail = url.split(marker, 1)
+    return head, tail
 
 
-def query_osrm(
-    coords: List[Tuple[float, float]],
-    endpoint: str,
+def make_osrm_formatter(
+    base_endpoint: str,
+    profile: str = "driving",
     extra_params: Optional[Dict[str, str]] = None,
-) -> dict:
+) -> Callable[[List[Tuple[float, float]]], str]:
+    """Return a function that builds the OSRM URL for a list of ``(lat, lon)``.
+
+    The endpoint, profile and query are resolved once; the returned closure
+    only formats the coordinate list.
     """
-    Request route alternatives from OSRM, preserving any query on `endpoint`
-    (e.g., ?exclude=motorway) and adding the usual params.
+    head, tail = _osrm_url_parts(base_endpoint, profile, tuple((extra_params or {}).items()))
+
+    def format_url(coords: List[Tuple[float, float]]) -> str:
+        # Append lon,lat;lon,lat...
+        return head + ";".join([f"{lon},{lat}" for lat, lon in coords]) + tail
+
+    return format_url
+
+
+def build_osrm_url(
+    base_endpoint: str,
+    coords: List[Tuple[float, float]],   # [(lat, lon), ...]
+    profile: str = "driving",
+    extra_params: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Merge any existing query string in base_endpoint with extra_params,
+    ensure the route path is present, and append coordinates.
     """
-    defaults = {
+    return make_osrm_formatter(base_endpoint, profile, extra_params)(coords)
+
+
+def osrm_params(extra_params: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """The query parameters :func:`query_osrm` sends, updated with ``extra_params``."""
+    params = {
         "alternatives": "true",
         "overview": "full",
         "geometries": "geojson",
     }
     if extra_params:
-        defaults.update(extra_params)
-    url = build_osrm_url(endpoint, coords, profile="driving", extra_params=defaults)
-    resp = requests.get(url, timeout=30)  # params already baked into URL
+        params.update(extra_params)
+    return params
+
+
+def query_osrm(
+    coords: List[Tuple[float, float]],
+    endpoint: str,
+    extra_params: Optional[Dict[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    url_formatter: Optional[Callable[[List[Tuple[float, float]]], str]] = None,
+) -> dict:
+    """
+    Request route alternatives from OSRM, preserving any query on `endpoint`
+    (e.g., ?exclude=motorway) and adding the usual params.  Pass `session`
+    to reuse keep-alive connections across calls, and a `url_formatter` from
+    :func:`make_osrm_formatter` (built with :func:`osrm_params`) to skip
+    resolving the endpoint on every request.
+    """
+    if url_formatter is None:
+        url_formatter = make_osrm_formatter(endpoint, profile="driving", extra_params=osrm_params(extra_params))
+    url = url_formatter(coords)
+    resp = (session or requests).get(url, timeout=30)  # params already baked into URL
     resp.raise_for_status()
     return resp.json()
 
@@ -135,15 +228,98 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+def equirect_distance_m(lat1: float, lon1: float, lat2: float, lon2: float, cos_lat0: float) -> float:
+    """Equirectangular approximation of the distance in metres.
+
+    ``cos_lat0`` is the cosine of a reference latitude near both points,
+    computed once per query point.  Over the few kilometres searched here
+    the error stays well under 0.1%, so it is used to rank neighbours;
+    reported distances still come from :func:`haversine_distance`.
+    """
+    dx = (lon2 - lon1) * cos_lat0
+    dy = lat2 - lat1
+    return METERS_PER_DEGREE * math.sqrt(dx * dx + dy * dy)
+
+
 def interpolate_point(lat1: float, lon1: float, lat2: float, lon2: float, fraction: float) -> Tuple[float, float]:
     lat = lat1 + (lat2 - lat1) * fraction
     lon = lon1 + (lon2 - lon1) * fraction
     return lat, lon
 
+def _densify_linestring_loop(lon: np.ndarray, lat: np.ndarray, step: float, out: np.ndarray) -> int:
+    """Kernel behind :func:`densify_linestring` with the haversine inlined.
+
+    Writes up to ``len(out)`` ``(lat, lon)`` rows into ``out`` and returns
+    the total number of points, so a first call with an empty ``out`` sizes
+    the buffer for the second.  Only fast once compiled by numba (see
+    ``_densify_linestring_jit``).
+    """
+    cap = out.shape[0]
+    if cap > 0:
+        out[0, 0] = lat[0]
+        out[0, 1] = lon[0]
+    count = 1
+    prev_lat = lat[0]
+    prev_lon = lon[0]
+    for i in range(1, lon.shape[0]):
+        curr_lat = lat[i]
+        curr_lon = lon[i]
+        phi1 = math.radians(prev_lat)
+        phi2 = math.radians(curr_lat)
+        dphi = math.radians(curr_lat - prev_lat)
+        dlambda = math.radians(curr_lon - prev_lon)
+        a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+        segment_len = EARTH_RADIUS_M * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+        if segment_len <= 0:
+            prev_lat = curr_lat
+            prev_lon = curr_lon
+            continue
+        distance_covered = 0.0
+        while distance_covered + step < segment_len:
+            fraction = (distance_covered + step) / segment_len
+            if count < cap:
+                out[count, 0] = prev_lat + (curr_lat - prev_lat) * fraction
+                out[count, 1] = prev_lon + (curr_lon - prev_lon) * fraction
+            count += 1
+            distance_covered += step
+        if count < cap:
+            out[count, 0] = curr_lat
+            out[count, 1] = curr_lon
+        count += 1
+        prev_lat = curr_lat
+        prev_lon = curr_lon
+    return count
+
+
+# With numba installed the linestring densifier runs as a compiled loop; road
+# anchors densify every feature of the roads file, so this is the bulk of
+# the start-up cost on large road networks.  The kernels in this file are
+# not cached on disk: this script is also loaded through importlib (see
+# ``10_route_validation.py``), and numba's cache entries name the module
+# that wrote them, which other loaders cannot import back.
+if numba is not None:
+    _densify_linestring_jit = numba.njit(nogil=True)(_densify_linestring_loop)
+else:
+    _densify_linestring_jit = None
+
+
+def _run_densify_kernel(kernel, coords: List[List[float]], step: float) -> List[Tuple[float, float]]:
+    """Run a densify kernel over GeoJSON ``coords``, sizing its output buffer first."""
+    arr = np.asarray(coords, dtype=np.float64)
+    lon = np.ascontiguousarray(arr[:, 0])
+    lat = np.ascontiguousarray(arr[:, 1])
+    step = float(step)
+    out = np.empty((kernel(lon, lat, step, np.empty((0, 2))), 2))
+    kernel(lon, lat, step, out)
+    return list(map(tuple, out.tolist()))
+
+
 def densify_linestring(coords: List[List[float]], step: float) -> List[Tuple[float, float]]:
     """Generate points along a LineString at a fixed interval."""
     if not coords:
         return []
+    if _densify_linestring_jit is not None:
+        return _run_densify_kernel(_densify_linestring_jit, coords, step)
     points = []
     prev_lon, prev_lat = coords[0]
     points.append((prev_lat, prev_lon))
@@ -164,46 +340,69 @@ def densify_linestring(coords: List[List[float]], step: float) -> List[Tuple[flo
     return points
 
 
-def densify_route(coords: List[List[float]], step: float) -> List[Tuple[float, float]]:
+def densify_route(coords: List[List[float]], step: float) -> np.ndarray:
     """Generate points along a polyline at a fixed interval.
 
     Input coords are [[lon, lat], ...] in GeoJSON order.  Step is in
-    metres.
+    metres.  Samples sit at every multiple of ``step`` along the line
+    (measured from the first vertex), located with a cumulative-length
+    search and interpolated in one vectorised pass.  Returns an ``(N, 2)``
+    float64 array of ``(lat, lon)`` rows.
     """
-    samples = []
+    if step <= 0:
+        raise ValueError("step must be > 0")
     if len(coords) < 2:
-        return samples
-    leftover = 0.0
-    prev_lon, prev_lat = coords[0]
-    for i in range(1, len(coords)):
-        curr_lon, curr_lat = coords[i]
-        segment_len = haversine_distance(prev_lat, prev_lon, curr_lat, curr_lon)
-        # accumulate leftover from previous segment
-        distance_covered = leftover
-        while distance_covered + step <= segment_len:
-            fraction = (distance_covered + step) / segment_len
-            lat, lon = interpolate_point(prev_lat, prev_lon, curr_lat, curr_lon, fraction)
-            samples.append((lat, lon))
-            distance_covered += step
-        leftover = segment_len - distance_covered
-        prev_lon, prev_lat = curr_lon, curr_lat
-    return samples
+        return np.empty((0, 2), dtype=np.float64)
+    arr = np.asarray(coords, dtype=np.float64)
+    lon = arr[:, 0]
+    lat = arr[:, 1]
+    segment_len = haversine_m_array(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    cumulative = np.concatenate(([0.0], np.cumsum(segment_len)))
+    targets = step * np.arange(1, int(cumulative[-1] // step) + 1)
+    # First vertex at or beyond each target; the sample lies on the segment
+    # ending there, which has positive length by construction.
+    seg = np.minimum(np.searchsorted(cumulative, targets) - 1, segment_len.shape[0] - 1)
+    fraction = np.minimum(1.0, (targets - cumulative[seg]) / segment_len[seg])
+    out_lat = lat[seg] + (lat[seg + 1] - lat[seg]) * fraction
+    out_lon = lon[seg] + (lon[seg + 1] - lon[seg]) * fraction
+    return np.column_stack((out_lat, out_lon))
 
 
 def load_edge_scores(path: str) -> List[Dict]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    features = data.get("features", [])
-    return features
+    return list(iter_geojson_features(path))
+
+
+@dataclass
+class ScenicPoints:
+    """Scenic ``(lat, lon, score)`` points as parallel arrays (structure of arrays)."""
 
+    lat: np.ndarray
+    lon: np.ndarray
+    score: np.ndarray
 
-def build_road_midpoints(edge_features: List[Dict]) -> List[Tuple[float, float, float]]:
-    """Create a list of road midpoints with scenic scores.
+    @classmethod
+    def from_points(cls, points: List[Tuple[float, float, float]]) -> "ScenicPoints":
+        """Build the arrays from ``(lat, lon, score)`` tuples."""
+        arr = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        return cls(
+            lat=np.ascontiguousarray(arr[:, 0]),
+            lon=np.ascontiguousarray(arr[:, 1]),
+            score=np.ascontiguousarray(arr[:, 2]),
+        )
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+
+def build_road_midpoints(edge_features: List[Dict]) -> ScenicPoints:
+    """Create road midpoints with scenic scores.
 
-    Each tuple contains (lat, lon, scenic_score).  If scenic_score is
-    None, the road is ignored.
+    Each point is the middle coordinate of a road with its scenic_score.
+    If scenic_score is None, the road is ignored.
     """
-    midpoints = []
+    lats: List[float] = []
+    lons: List[float] = []
+    scores: List[float] = []
     for feat in edge_features:
         props = feat.get("properties", {})
         score = props.get("scenic_score")
@@ -215,16 +414,21 @@ def build_road_midpoints(edge_features: List[Dict]) -> List[Tuple[float, float,
         # Compute midpoint of the polyline by taking the middle coordinate
         mid_idx = len(coords) // 2
         lon, lat = coords[mid_idx]
-        midpoints.append((lat, lon, score))
-    return midpoints
+        lats.append(lat)
+        lons.append(lon)
+        scores.append(score)
+    return ScenicPoints(
+        lat=np.asarray(lats, dtype=np.float64),
+        lon=np.asarray(lons, dtype=np.float64),
+        score=np.asarray(scores, dtype=np.float64),
+    )
 
 
 def load_roads(path: str) -> List[Dict]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data.get("features", [])
+    return list(iter_geojson_features(path))
 
 
+@lru_cache(maxsize=1024)
 def normalize_highway_tag(tag: Optional[str]) -> Optional[str]:
     if not tag:
         return None
@@ -235,43 +439,192 @@ def normalize_highway_tag(tag: Optional[str]) -> Optional[str]:
     return tag
 
 
-def build_road_anchors(
-    road_features: List[Dict],
-    step_m: float,
-) -> List[Tuple[float, float, float, str]]:
-    anchors: List[Tuple[float, float, float, str]] = []
+@dataclass
+class RoadAnchors:
+    """Road anchor points as parallel arrays (structure of arrays).
+
+    ``class_id`` indexes ``classes`` (the normalised highway tags seen) and
+    ``weight`` holds the matching :data:`ROAD_CLASS_WEIGHTS` entry per point.
+    """
+
+    lat: np.ndarray
+    lon: np.ndarray
+    weight: np.ndarray
+    class_id: np.ndarray
+    classes: List[str]
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+
+def scan_roads(road_features: List[Dict], step_m: float) -> Tuple[RoadAnchors, np.ndarray]:
+    """Build the road anchors and dead-end nodes in one pass over the features.
+
+    Returns what :func:`build_road_anchors` and :func:`build_dead_end_nodes`
+    return, but reads each feature's tags and coordinates only once.
+    """
+    lats: List[float] = []
+    lons: List[float] = []
+    class_ids: List[int] = []
+    class_lookup: Dict[str, int] = {}
+    end_lats: List[float] = []
+    end_lons: List[float] = []
+    densify = bool(step_m and step_m > 0)
     for feat in road_features:
+        coords = feat.get("geometry", {}).get("coordinates", [])
+        if not coords:
+            continue
+        if len(coords) >= 2:
+            start_lon, start_lat = coords[0]
+            end_lon, end_lat = coords[-1]
+            end_lats.append(round(start_lat, 6))
+            end_lons.append(round(start_lon, 6))
+            end_lats.append(round(end_lat, 6))
+            end_lons.append(round(end_lon, 6))
         props = feat.get("properties", {}) or {}
         tags = props.get("tags", {}) or {}
-        highway_raw = tags.get("highway")
-        highway = normalize_highway_tag(highway_raw)
+        highway = normalize_highway_tag(tags.get("highway"))
         if not highway:
             continue
-        weight = ROAD_CLASS_WEIGHTS.get(highway, DEFAULT_ROAD_WEIGHT)
-        coords = feat.get("geometry", {}).get("coordinates", [])
-        if not coords:
-            continue
-        points = densify_linestring(coords, step_m) if step_m and step_m > 0 else [(coords[0][1], coords[0][0])]
+        class_id = class_lookup.setdefault(highway, len(class_lookup))
+        points = densify_linestring(coords, step_m) if densify else [(coords[0][1], coords[0][0])]
         for lat, lon in points:
-            anchors.append((lat, lon, weight, highway))
-    return anchors
+            lats.append(lat)
+            lons.append(lon)
+        class_ids.extend([class_id] * len(points))
+    classes = list(class_lookup)
+    class_weights = np.array([ROAD_CLASS_WEIGHTS.get(c, DEFAULT_ROAD_WEIGHT) for c in classes], dtype=np.float64)
+    class_id_arr = np.asarray(class_ids, dtype=np.int16)
+    anchors = RoadAnchors(
+        lat=np.asarray(lats, dtype=np.float64),
+        lon=np.asarray(lons, dtype=np.float64),
+        weight=class_weights[class_id_arr] if classes else np.empty(0),
+        class_id=class_id_arr,
+        classes=classes,
+    )
+    return anchors, _unshared_endpoints(end_lats, end_lons)
+
 
+def build_road_anchors(
+    road_features: List[Dict],
+    step_m: float,
+) -> RoadAnchors:
+    return scan_roads(road_features, step_m)[0]
+
+
+def _unshared_endpoints(lats: List[float], lons: List[float]) -> np.ndarray:
+    """Return the endpoints (already rounded to 6 decimals) that occur once.
+
+    Each endpoint is packed into one int64 key and counted with ``np.unique``
+    instead of a dict of coordinate tuples; the result keeps first-seen order.
+    """
+    if not lats:
+        return np.empty((0, 2), dtype=np.float64)
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    # Values are already rounded to 6 decimals, so micro-degrees are exact.
+    keys = (np.rint(lat * 1e6).astype(np.int64) + 90_000_000) * 360_000_001 + (
+        np.rint(lon * 1e6).astype(np.int64) + 180_000_000
+    )
+    _, first_seen, counts = np.unique(keys, return_index=True, return_counts=True)
+    dead = np.sort(first_seen[counts == 1])
+    return np.column_stack((lat[dead], lon[dead]))
 
-def build_dead_end_nodes(road_features: List[Dict]) -> List[Tuple[float, float]]:
-    endpoint_counts: Dict[Tuple[float, float], int] = {}
+
+def build_dead_end_nodes(road_features: List[Dict]) -> np.ndarray:
+    """Return the ``(lat, lon)`` of road endpoints shared by no other road.
+
+    The result is an ``(N, 2)`` float64 array in first-seen order.
+    """
+    lats: List[float] = []
+    lons: List[float] = []
     for feat in road_features:
         coords = feat.get("geometry", {}).get("coordinates", [])
         if len(coords) < 2:
             continue
         start_lon, start_lat = coords[0]
         end_lon, end_lat = coords[-1]
-        start_key = (round(start_lat, 6), round(start_lon, 6))
-        end_key = (round(end_lat, 6), round(end_lon, 6))
-        endpoint_counts[start_key] = endpoint_counts.get(start_key, 0) + 1
-        endpoint_counts[end_key] = endpoint_counts.get(end_key, 0) + 1
+        lats.append(round(start_lat, 6))
+        lons.append(round(start_lon, 6))
+        lats.append(round(end_lat, 6))
+        lons.append(round(end_lon, 6))
+    return _unshared_endpoints(lats, lons)
+
+
+# Bump when the anchor or dead-end construction changes so cached road
+# indexes built by older code are not reused.
+ROAD_INDEX_VERSION = 1
+
+
+@dataclass
+class RoadIndex:
+    """Everything derived from a roads file: anchors, dead ends, feature count."""
+
+    anchors: RoadAnchors
+    dead_ends: np.ndarray
+    feature_count: int
 
-    dead_ends = [(lat, lon) for (lat, lon), count in endpoint_counts.items() if count == 1]
-    return dead_ends
+
+def _road_index_cache_path(cache_dir: Path, roads_path: Path, step_m: float) -> Path:
+    """Cache file for ``roads_path``; the key changes whenever the file does."""
+    stat = roads_path.stat()
+    key = DiskCache.key_from_mapping(
+        {
+            "path": str(roads_path.resolve()),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "step_m": step_m,
+            "version": ROAD_INDEX_VERSION,
+        }
+    )
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    return cache_dir / "road_index" / f"{digest}.npz"
+
+
+def load_road_index(roads_path: Path, step_m: float, cache_dir: Optional[Path] = None) -> RoadIndex:
+    """Build (or reload) the road anchors and dead-end nodes for ``roads_path``.
+
+    With ``cache_dir`` the arrays are saved as one ``.npz`` file keyed by the
+    roads file's path, size and modification time plus ``step_m``, so later
+    runs against an unchanged roads file skip parsing and densifying it.
+    """
+    cache_path = _road_index_cache_path(cache_dir, roads_path, step_m) if cache_dir else None
+    if cache_path is not None and cache_path.exists():
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                return RoadIndex(
+                    anchors=RoadAnchors(
+                        lat=data["lat"],
+                        lon=data["lon"],
+                        weight=data["weight"],
+                        class_id=data["class_id"],
+                        classes=data["classes"].tolist(),
+                    ),
+                    dead_ends=data["dead_ends"],
+                    feature_count=int(data["feature_count"]),
+                )
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable entry; rebuild below
+
+    road_features = load_roads(str(roads_path))
+    anchors, dead_ends = scan_roads(road_features, step_m)
+    index = RoadIndex(anchors=anchors, dead_ends=dead_ends, feature_count=len(road_features))
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                lat=index.anchors.lat,
+                lon=index.anchors.lon,
+                weight=index.anchors.weight,
+                class_id=index.anchors.class_id,
+                classes=np.array(index.anchors.classes, dtype=str),
+                dead_ends=index.dead_ends,
+                feature_count=np.int64(index.feature_count),
+            )
+        os.replace(tmp, cache_path)
+    return index
 
 
 def build_grid_index(points: List[Tuple], cell_deg: float) -> Dict[Tuple[int, int], List[Tuple]]:
@@ -310,46 +663,119 @@ def nearest_index_point(
 ) -> Optional[Tuple[Tuple, float]]:
     best = None
     best_dist = float("inf")
+    cos_lat0 = math.cos(math.radians(lat))
     radius_cells = cell_radius_for_distance(cell_deg, max_distance_m)
     for cell in iter_neighbor_cells(lat, lon, cell_deg, radius_cells):
         for pt in grid.get(cell, []):
-            d = haversine_distance(lat, lon, pt[0], pt[1])
+            d = equirect_distance_m(lat, lon, pt[0], pt[1], cos_lat0)
             if d < best_dist:
                 best = pt
                 best_dist = d
     if best is None:
         return None
+    best_dist = haversine_distance(lat, lon, best[0], best[1])
     if max_distance_m is not None and best_dist > max_distance_m:
         return None
     return best, best_dist
 
 
+def unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Return ``(N, 3)`` unit-sphere xyz coordinates for degree lat/lon arrays."""
+    lat_r = np.radians(lat)
+    lon_r = np.radians(lon)
+    cos_lat = np.cos(lat_r)
+    return np.column_stack((cos_lat * np.cos(lon_r), cos_lat * np.sin(lon_r), np.sin(lat_r)))
+
+
+class PointIndex:
+    """Nearest-neighbour lookups over a fixed set of points.
+
+    With SciPy installed the points go into a ``cKDTree`` over unit-sphere
+    xyz coordinates (chord length ranks points exactly like great-circle
+    distance) and every query is answered in one batched call.  Without it
+    the degree grid of :func:`build_grid_index` is probed point by point.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, cell_deg: float) -> None:
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self._tree = None
+        self._tree_ids = np.empty(0, dtype=np.intp)
+        self._grid: Dict[Tuple[int, int], List[Tuple]] = {}
+        if cKDTree is not None and len(self):
+            coords = np.column_stack((self.lat, self.lon))
+            # Coincident points (e.g. shared road nodes) keep only their first
+            # occurrence so ties resolve to the lowest index, as in the grid.
+            _, first = np.unique(coords, axis=0, return_index=True)
+            self._tree_ids = np.sort(first)
+            self._tree = cKDTree(unit_vectors(self.lat[self._tree_ids], self.lon[self._tree_ids]))
+        else:
+            self._grid = build_grid_index(
+                list(zip(self.lat.tolist(), self.lon.tolist(), range(len(self)))), cell_deg
+            )
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+    def nearest(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        max_distance_m: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the index of and distance (m) to the nearest point per query.
+
+        Queries with no point within ``max_distance_m`` get index -1 and
+        distance ``inf``.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        idx = np.full(lats.shape[0], -1, dtype=np.intp)
+        dist = np.full(lats.shape[0], np.inf)
+        if not len(self) or lats.shape[0] == 0:
+            return idx, dist
+        if self._tree is not None:
+            bound = np.inf
+            if max_distance_m is not None:
+                # Chord length of the search radius, padded for rounding.
+                bound = 2.0 * math.sin(min(math.pi / 2, max_distance_m / (2 * EARTH_RADIUS_M))) * (1 + 1e-9)
+            chord, found = self._tree.query(unit_vectors(lats, lons), k=1, distance_upper_bound=bound)
+            hit = found < self._tree_ids.shape[0]
+            idx[hit] = self._tree_ids[found[hit]]
+            dist[hit] = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, chord[hit] / 2))
+        else:
+            for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())):
+                result = nearest_index_point(lat, lon, self._grid, self.cell_deg, max_distance_m)
+                if result is not None:
+                    idx[i] = result[0][2]
+                    dist[i] = result[1]
+        if max_distance_m is not None:
+            far = dist > max_distance_m
+            idx[far] = -1
+            dist[far] = np.inf
+        return idx, dist
+
+
 def apply_road_weighting(
-    heatmap_points: List[Tuple[float, float, float]],
-    anchors: List[Tuple[float, float, float, str]],
+    heatmap_points: ScenicPoints,
+    anchors: RoadAnchors,
     max_distance_m: Optional[float],
     cell_deg: float,
-) -> List[Tuple[float, float, float]]:
-    if not anchors:
+) -> ScenicPoints:
+    if not len(anchors) or not len(heatmap_points):
         return heatmap_points
-    grid = build_grid_index(anchors, cell_deg)
-    weighted = []
-    used = 0
-    weights: List[float] = []
-    for lat, lon, score in heatmap_points:
-        nearest = nearest_index_point(lat, lon, grid, cell_deg, max_distance_m)
-        if nearest is None:
-            weighted.append((lat, lon, score))
-            continue
-        anchor, _dist = nearest
-        weight = anchor[2]
-        used += 1
-        weights.append(weight)
-        weighted.append((lat, lon, score * weight))
-    if weights:
-        avg_weight = sum(weights) / len(weights)
+    index = PointIndex(anchors.lat, anchors.lon, cell_deg)
+    nearest, _dist = index.nearest(heatmap_points.lat, heatmap_points.lon, max_distance_m)
+    hit = nearest >= 0
+    weights = anchors.weight[nearest[hit]]
+    scores = heatmap_points.score.copy()
+    scores[hit] *= weights
+    used = int(np.count_nonzero(hit))
+    if used:
+        avg_weight = float(weights.mean())
         print(f"Applied road class weighting to {used}/{len(heatmap_points)} points (avg weight {avg_weight:.2f}).")
-    return weighted
+    return ScenicPoints(lat=heatmap_points.lat, lon=heatmap_points.lon, score=scores)
 
 
 def nearest_score(
@@ -358,30 +784,403 @@ def nearest_score(
     candidates: List[Tuple[float, float, float]],
     max_distance: Optional[float] = None,
 ) -> Optional[Tuple[float, float]]:
-    """Find the scenic score (and distance) of the closest candidate."""
-    min_dist = float("inf")
+    """Find the scenic score (and distance) of the closest candidate.
+
+    Candidates are ranked by the squared equirectangular offset in degrees,
+    which orders them like :func:`equirect_distance_m` without its square
+    root.  With ``max_distance`` a candidate whose latitude alone is farther
+    off than that is skipped before any arithmetic: its great-circle
+    distance exceeds ``max_distance``, so it could never be returned.
+    """
+    min_sq = float("inf")
     min_score = None
+    nearest = None
+    cos_lat0 = math.cos(math.radians(lat))
+    lat_band = float("inf") if max_distance is None else max_distance / METERS_PER_DEGREE
     for c_lat, c_lon, score in candidates:
-        d = haversine_distance(lat, lon, c_lat, c_lon)
-        if d < min_dist:
-            min_dist = d
+        dy = c_lat - lat
+        if abs(dy) > lat_band:
+            continue
+        dx = (c_lon - lon) * cos_lat0
+        d_sq = dx * dx + dy * dy
+        if d_sq < min_sq:
+            min_sq = d_sq
             min_score = score
+            nearest = (c_lat, c_lon)
     if min_score is None:
         return None
+    min_dist = haversine_distance(lat, lon, nearest[0], nearest[1])
     if max_distance is not None and min_dist > max_distance:
         return None
     return min_score, min_dist
 
 
+@dataclass
+class ScenicIndex:
+    """Scenic candidates as parallel arrays (structure of arrays).
+
+    Everything that depends only on a candidate's position is computed once:
+    the sine and cosine of half its latitude and longitude plus the cosine of
+    its latitude.  The haversine term against a sample then expands into
+    products of these columns, so matching a sample needs no per-candidate
+    trigonometry at all.  ``xyz`` holds the unit-sphere vectors as a
+    ``(3, N)`` array for ranking candidates by dot product; with SciPy
+    installed ``tree`` is a ``cKDTree`` over the same vectors.
+    """
+
+    sin_half_lat: np.ndarray
+    cos_half_lat: np.ndarray
+    sin_half_lon: np.ndarray
+    cos_half_lon: np.ndarray
+    cos_lat: np.ndarray
+    score: np.ndarray
+    xyz: np.ndarray
+    tree: Optional["cKDTree"] = None
+
+    @classmethod
+    def from_points(cls, candidates: Union[ScenicPoints, List[Tuple[float, float, float]]]) -> "ScenicIndex":
+        """Build the index from :class:`ScenicPoints` or ``(lat, lon, score)`` tuples."""
+        points = candidates if isinstance(candidates, ScenicPoints) else ScenicPoints.from_points(candidates)
+        half_lat = np.radians(points.lat) / 2
+        half_lon = np.radians(points.lon) / 2
+        xyz = unit_vectors(points.lat, points.lon)
+        return cls(
+            sin_half_lat=np.sin(half_lat),
+            cos_half_lat=np.cos(half_lat),
+            sin_half_lon=np.sin(half_lon),
+            cos_half_lon=np.cos(half_lon),
+            cos_lat=np.cos(2 * half_lat),
+            score=points.score.copy(),
+            xyz=np.ascontiguousarray(xyz.T),
+            tree=cKDTree(xyz) if cKDTree is not None and len(points) else None,
+        )
+
+    def __len__(self) -> int:
+        return int(self.score.shape[0])
+
+    def tile(self, start: int, stop: int) -> "ScenicIndex":
+        """Return candidates ``start:stop`` as an index of array views."""
+        return ScenicIndex(
+            sin_half_lat=self.sin_half_lat[start:stop],
+            cos_half_lat=self.cos_half_lat[start:stop],
+            sin_half_lon=self.sin_half_lon[start:stop],
+            cos_half_lon=self.cos_half_lon[start:stop],
+            cos_lat=self.cos_lat[start:stop],
+            score=self.score[start:stop],
+            xyz=self.xyz[:, start:stop],
+        )
+
+    def haversine_terms(
+        self, lat_r: np.ndarray, lon_r: np.ndarray, candidate_ids: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the haversine ``a`` term between every candidate and the
+        samples in the column vectors ``lat_r``/``lon_r`` (radians).
+
+        ``sin((x - y) / 2)`` is expanded with the angle-difference identity
+        into the precomputed half-angle columns.  With ``candidate_ids`` the
+        samples are flat arrays paired element-wise with those candidates.
+        """
+        columns = (self.sin_half_lat, self.cos_half_lat, self.sin_half_lon, self.cos_half_lon, self.cos_lat)
+        if candidate_ids is not None:
+            columns = tuple(column[candidate_ids] for column in columns)
+        sin_half_lat, cos_half_lat, sin_half_lon, cos_half_lon, cos_lat = columns
+        sin_dlat = sin_half_lat * np.cos(lat_r / 2) - cos_half_lat * np.sin(lat_r / 2)
+        sin_dlon = sin_half_lon * np.cos(lon_r / 2) - cos_half_lon * np.sin(lon_r / 2)
+        return sin_dlat * sin_dlat + (np.cos(lat_r) * cos_lat) * (sin_dlon * sin_dlon)
+
+
+def nearest_score_array(
+    lat: float,
+    lon: float,
+    index: ScenicIndex,
+    max_distance: Optional[float] = None,
+) -> Optional[Tuple[float, float]]:
+    """Vectorised :func:`nearest_score` over a :class:`ScenicIndex`.
+
+    The haversine term ``a`` grows monotonically with distance, so the
+    closest candidate is its argmin and only that one is converted to metres.
+    """
+    if len(index) == 0:
+        return None
+    a = index.haversine_terms(np.array([math.radians(lat)]), np.array([math.radians(lon)]))
+    idx = int(a.argmin())
+    min_dist = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, float(a[idx]))))
+    if max_distance is not None and min_dist > max_distance:
+        return None
+    return float(index.score[idx]), min_dist
+
+
+def _rerank_near_ties(
+    index: ScenicIndex,
+    lat_r: np.ndarray,
+    lon_r: np.ndarray,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    best: np.ndarray,
+) -> None:
+    """Set ``best[row]`` to the exact nearest of each row's candidate pairs.
+
+    ``rows``/``cols`` are sample/candidate pairs grouped by row with
+    ascending candidate ids, so the first exact minimum of a row is the one
+    ``argmin`` would pick.
+    """
+    a = index.haversine_terms(lat_r[rows], lon_r[rows], cols)
+    row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    row_min = np.repeat(np.minimum.reduceat(a, row_starts), np.diff(np.r_[row_starts, rows.shape[0]]))
+    at_min = np.flatnonzero(a == row_min)
+    first = at_min[np.r_[True, rows[at_min[1:]] != rows[at_min[:-1]]]]
+    best[rows[first]] = cols[first]
+
+
+def _nearest_by_tree(index: ScenicIndex, lat_r: np.ndarray, lon_r: np.ndarray, sample_xyz: np.ndarray) -> np.ndarray:
+    """Nearest candidate per sample from ``index.tree``.
+
+    Chord length ranks candidates like great-circle distance.  When the two
+    nearest chords are within ``CHORD_TOLERANCE`` every candidate in that
+    margin is collected and re-ranked exactly, as the scan does.
+    """
+    chord, found = index.tree.query(sample_xyz, k=2, workers=-1)
+    best = found[:, 0].astype(np.intp)
+    tied = np.flatnonzero(chord[:, 1] <= chord[:, 0] + CHORD_TOLERANCE)
+    if tied.size:
+        near = index.tree.query_ball_point(sample_xyz[tied], chord[tied, 0] + CHORD_TOLERANCE)
+        cols = [np.sort(np.asarray(ids, dtype=np.intp)) for ids in near]
+        rows = np.repeat(tied, [c.shape[0] for c in cols])
+        _rerank_near_ties(index, lat_r, lon_r, rows, np.concatenate(cols), best)
+    return best
+
+
+def _nearest_by_scan(index: ScenicIndex, lat_r: np.ndarray, lon_r: np.ndarray, sample_xyz: np.ndarray) -> np.ndarray:
+    """Nearest candidate per sample from a tiled dot-product scan.
+
+    Candidates are walked in tiles of ``CANDIDATE_TILE`` and each tile is
+    matched against blocks of samples sized to about ``PAIR_BLOCK_ELEMENTS``
+    pairs, keeping a running best per sample, so memory stays bounded
+    however many candidates there are.
+
+    Distance ranks candidates the same way as the dot product of unit-sphere
+    vectors, so each block is one matrix product with the tile's ``xyz``.
+    Only the candidates within ``DOT_TOLERANCE`` of a sample's largest dot
+    product are re-ranked with the exact haversine term, which yields the
+    same match as a haversine scan.
+    """
+    n = sample_xyz.shape[0]
+    best = np.zeros(n, dtype=np.intp)
+    best_dot = np.full(n, -np.inf)
+    tile_size = min(len(index), CANDIDATE_TILE)
+    block = max(1, PAIR_BLOCK_ELEMENTS // tile_size)
+    # Pairs within the margin of the running best.  That best only grows,
+    # so every pair within the margin of the final one is kept.
+    near_rows: List[np.ndarray] = []
+    near_cols: List[np.ndarray] = []
+    near_dot: List[np.ndarray] = []
+    for tile_start in range(0, len(index), tile_size):
+        tile_xyz = index.xyz[:, tile_start : tile_start + tile_size]
+        for start in range(0, n, block):
+            stop = min(n, start + block)
+            dot = sample_xyz[start:stop] @ tile_xyz
+            idx = dot.argmax(axis=1)
+            tile_max = dot[np.arange(stop - start), idx]
+            # Strictly larger only, so ties keep the lowest candidate id.
+            better = np.flatnonzero(tile_max > best_dot[start:stop])
+            best_dot[start + better] = tile_max[better]
+            best[start + better] = tile_start + idx[better]
+            limit = best_dot[start:stop] - DOT_TOLERANCE
+            rows = np.flatnonzero(tile_max >= limit)
+            # Usually a row's argmax is its only pair inside the margin; the
+            # full mask is searched only when some row has more.
+            if np.count_nonzero(dot >= limit[:, None]) > rows.size:
+                rows, cols = np.nonzero(dot >= limit[:, None])
+            else:
+                cols = idx[rows]
+            near_rows.append(rows + start)
+            near_cols.append(cols + tile_start)
+            near_dot.append(dot[rows, cols])
+    rows = np.concatenate(near_rows)
+    cols = np.concatenate(near_cols)
+    keep = np.concatenate(near_dot) >= (best_dot - DOT_TOLERANCE)[rows]
+    rows, cols = rows[keep], cols[keep]
+    # Most samples have a single candidate inside the margin, which is then
+    # the nearest as well; only the rest are re-ranked.
+    tied = (np.bincount(rows, minlength=n) > 1)[rows]
+    if tied.any():
+        # Tiles were walked in order, so a stable sort by row keeps the
+        # candidate ids ascending within each row.
+        order = np.argsort(rows[tied], kind="stable")
+        _rerank_near_ties(index, lat_r, lon_r, rows[tied][order], cols[tied][order], best)
+    return best
+
+
+def _nearest_scan_loop(
+    sample_xyz: np.ndarray,
+    cos_half_lat_s: np.ndarray,
+    sin_half_lat_s: np.ndarray,
+    cos_half_lon_s: np.ndarray,
+    sin_half_lon_s: np.ndarray,
+    cos_lat_s: np.ndarray,
+    xyz: np.ndarray,
+    sin_half_lat: np.ndarray,
+    cos_half_lat: np.ndarray,
+    sin_half_lon: np.ndarray,
+    cos_half_lon: np.ndarray,
+    cos_lat: np.ndarray,
+    tolerance: float,
+    best: np.ndarray,
+) -> None:
+    """Kernel behind :func:`nearest_scores_array` without SciPy.
+
+    Writes the index of the first candidate with the smallest haversine
+    ``a`` term per sample into ``best``.  Candidates are ranked by their
+    unit-vector dot product with the sample; one more than ``tolerance``
+    below the largest seen so far is certainly farther and is skipped, and
+    the rest get the exact ``a`` term, evaluated in the same order as
+    :meth:`ScenicIndex.haversine_terms` so the result matches the NumPy
+    path.  Only fast once compiled by numba (see ``_nearest_scan_jit``).
+    """
+    for i in _prange(sample_xyz.shape[0]):
+        sx = sample_xyz[i, 0]
+        sy = sample_xyz[i, 1]
+        sz = sample_xyz[i, 2]
+        best_dot = -math.inf
+        best_a = math.inf
+        best_j = 0
+        for j in range(xyz.shape[1]):
+            dot = sx * xyz[0, j] + sy * xyz[1, j] + sz * xyz[2, j]
+            if dot < best_dot - tolerance:
+                continue
+            if dot > best_dot:
+                best_dot = dot
+            sin_dlat = sin_half_lat[j] * cos_half_lat_s[i] - cos_half_lat[j] * sin_half_lat_s[i]
+            sin_dlon = sin_half_lon[j] * cos_half_lon_s[i] - cos_half_lon[j] * sin_half_lon_s[i]
+            a = sin_dlat * sin_dlat + (cos_lat_s[i] * cos_lat[j]) * (sin_dlon * sin_dlon)
+            if a < best_a:
+                best_a = a
+                best_j = j
+        best[i] = best_j
+
+
+# With numba installed (and SciPy missing) samples are matched by a compiled
+# loop over all candidates, one sample per thread; it needs no temporaries.
+# fastmath is left off so ``a`` rounds exactly as in NumPy.
+if numba is not None:
+    _nearest_scan_jit = numba.njit(parallel=True)(_nearest_scan_loop)
+else:
+    _nearest_scan_jit = None
+
+
+def _nearest_by_jit(index: ScenicIndex, lat_r: np.ndarray, lon_r: np.ndarray, sample_xyz: np.ndarray) -> np.ndarray:
+    """Nearest candidate per sample from ``_nearest_scan_jit``."""
+    best = np.zeros(lat_r.shape[0], dtype=np.intp)
+    _nearest_scan_jit(
+        sample_xyz,
+        np.cos(lat_r / 2),
+        np.sin(lat_r / 2),
+        np.cos(lon_r / 2),
+        np.sin(lon_r / 2),
+        np.cos(lat_r),
+        index.xyz,
+        index.sin_half_lat,
+        index.cos_half_lat,
+        index.sin_half_lon,
+        index.cos_half_lon,
+        index.cos_lat,
+        DOT_TOLERANCE,
+        best,
+    )
+    return best
+
+
+def nearest_scores_array(
+    sample_lats: np.ndarray,
+    sample_lons: np.ndarray,
+    index: ScenicIndex,
+    max_distance: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Match every sample to its closest candidate.
+
+    Returns the matched score and distance (m) per sample; samples with no
+    candidate within ``max_distance`` get score ``nan`` and distance ``inf``.
+    Uses ``index.tree`` when SciPy is installed, else a compiled scan when
+    numba is, else a tiled NumPy scan; all pick the same candidate.
+    """
+    n = sample_lats.shape[0]
+    scores = np.full(n, np.nan)
+    dists = np.full(n, np.inf)
+    if n == 0 or len(index) == 0:
+        return scores, dists
+    lat_r = np.radians(sample_lats)
+    lon_r = np.radians(sample_lons)
+    sample_xyz = unit_vectors(sample_lats, sample_lons)
+    if index.tree is not None:
+        best = _nearest_by_tree(index, lat_r, lon_r, sample_xyz)
+    elif _nearest_scan_jit is not None:
+        best = _nearest_by_jit(index, lat_r, lon_r, sample_xyz)
+    else:
+        best = _nearest_by_scan(index, lat_r, lon_r, sample_xyz)
+    best_a = index.haversine_terms(lat_r, lon_r, best)
+    min_dist = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(best_a, 0.0, 1.0)))
+    hit = np.ones(n, dtype=bool) if max_distance is None else min_dist <= max_distance
+    scores[hit] = index.score[best[hit]]
+    dists[hit] = min_dist[hit]
+    return scores, dists
+
+
+def compute_routes_scenic(
+    sample_sets: List[Union[np.ndarray, List[Tuple[float, float]]]],
+    index: ScenicIndex,
+    max_distance: Optional[float] = None,
+) -> List[Optional[Dict[str, float]]]:
+    """Compute :func:`compute_route_scenic` statistics for many routes at once.
+
+    The samples of every route are matched against ``index`` in one batch and
+    split back per route with ``np.bincount`` over a route-id vector, so the
+    candidate arrays are streamed once per block rather than once per route.
+    """
+    results: List[Optional[Dict[str, float]]] = [None] * len(sample_sets)
+    totals = np.array([len(samples) for samples in sample_sets], dtype=np.intp)
+    if not totals.sum():
+        return results
+    points = np.concatenate([np.asarray(samples, dtype=np.float64).reshape(-1, 2) for samples in sample_sets])
+    route_ids = np.repeat(np.arange(len(sample_sets)), totals)
+    scores, dists = nearest_scores_array(points[:, 0], points[:, 1], index, max_distance=max_distance)
+    hit = np.isfinite(dists)
+    hit_ids = route_ids[hit]
+    matched = np.bincount(hit_ids, minlength=len(sample_sets))
+    score_sums = np.bincount(hit_ids, weights=scores[hit], minlength=len(sample_sets))
+    dist_sums = np.bincount(hit_ids, weights=dists[hit], minlength=len(sample_sets))
+    for i in np.flatnonzero(matched).tolist():
+        count = int(matched[i])
+        results[i] = {
+            "mean": float(score_sums[i]) / count,
+            "coverage": count / int(totals[i]),
+            "sampled_points": count,
+            "total_samples": int(totals[i]),
+            "avg_lookup_distance": float(dist_sums[i]) / count,
+        }
+    return results
+
+
 def compute_route_scenic(
-    samples: List[Tuple[float, float]],
-    candidates: List[Tuple[float, float, float]],
+    samples: Union[np.ndarray, List[Tuple[float, float]]],
+    candidates: Union[ScenicIndex, ScenicPoints, List[Tuple[float, float, float]]],
     max_distance: Optional[float] = None,
 ) -> Optional[Dict[str, float]]:
-    """Compute scenic statistics along a sampled route from heatmap points."""
-    if not samples:
+    """Compute scenic statistics along a sampled route from heatmap points.
+
+    ``samples`` holds ``(lat, lon)`` rows, e.g. from :func:`densify_route`.
+    ``candidates`` is a list of ``(lat, lon, score)`` tuples, a
+    :class:`ScenicPoints` or, to reuse the precomputed trigonometry across
+    routes, a :class:`ScenicIndex`.
+    """
+    if len(samples) == 0:
         return None
 
+    index = candidates if isinstance(candidates, ScenicIndex) else None
+    if index is None and (isinstance(candidates, ScenicPoints) or len(candidates) >= VECTOR_MIN_CANDIDATES):
+        index = ScenicIndex.from_points(candidates)
+    if index is not None:
+        return compute_routes_scenic([samples], index, max_distance=max_distance)[0]
+
     matched_scores: List[float] = []
     lookup_distances: List[float] = []
     for lat, lon in samples:
@@ -408,15 +1207,14 @@ def compute_route_scenic(
 
 
 def select_waypoints(
-    candidates: List[Tuple[float, float, float]],
+    candidates: ScenicPoints,
     origin: Tuple[float, float],
     dest: Tuple[float, float],
     count: int,
     radius_m: float,
     min_distance_m: float,
     min_separation_m: float,
-    dead_end_grid: Optional[Dict[Tuple[int, int], List[Tuple[float, float]]]] = None,
-    dead_end_cell_deg: float = 0.002,
+    dead_end_index: Optional[PointIndex] = None,
     dead_end_radius_m: float = 0.0,
 ) -> List[Tuple[float, float, float]]:
     if count <= 0:
@@ -424,42 +1222,38 @@ def select_waypoints(
     mid_lat = (origin[0] + dest[0]) / 2.0
     mid_lon = (origin[1] + dest[1]) / 2.0
 
-    filtered = []
-    for lat, lon, score in candidates:
-        if haversine_distance(lat, lon, mid_lat, mid_lon) > radius_m:
-            continue
-        if haversine_distance(lat, lon, origin[0], origin[1]) < min_distance_m:
-            continue
-        if haversine_distance(lat, lon, dest[0], dest[1]) < min_distance_m:
-            continue
-        if dead_end_grid and dead_end_radius_m and dead_end_radius_m > 0:
-            nearest_dead = nearest_index_point(
-                lat,
-                lon,
-                dead_end_grid,
-                dead_end_cell_deg,
-                max_distance_m=dead_end_radius_m,
-            )
-            if nearest_dead is not None:
-                continue
-        filtered.append((lat, lon, score))
-
-    filtered.sort(key=lambda x: x[2], reverse=True)
+    if not len(candidates):
+        return []
+    lats = candidates.lat
+    lons = candidates.lon
+    # One vectorised sweep over all candidates replaces three scalar
+    # haversine calls per point; the candidates' latitude cosines are
+    # computed once and shared by every sweep below.
+    cos_lats = np.cos(np.radians(lats))
+    keep = haversine_m_array(lats, lons, mid_lat, mid_lon, cos_lats) <= radius_m
+    keep &= haversine_m_array(lats, lons, origin[0], origin[1], cos_lats) >= min_distance_m
+    keep &= haversine_m_array(lats, lons, dest[0], dest[1], cos_lats) >= min_distance_m
+    kept = np.flatnonzero(keep)
+
+    if kept.size and dead_end_index and dead_end_radius_m and dead_end_radius_m > 0:
+        # Drop candidates within the radius of any dead-end node in one batch.
+        nearest_dead, _dist = dead_end_index.nearest(lats[kept], lons[kept], dead_end_radius_m)
+        kept = kept[nearest_dead < 0]
+
+    # Highest score first; the stable sort keeps input order among ties.
+    remaining = kept[np.argsort(-candidates.score[kept], kind="stable")]
     chosen: List[Tuple[float, float, float]] = []
-    for lat, lon, score in filtered:
-        if len(chosen) >= count:
-            break
-        if all(haversine_distance(lat, lon, c_lat, c_lon) >= min_separation_m for c_lat, c_lon, _ in chosen):
-            chosen.append((lat, lon, score))
+    # Greedy pick: take the best remaining candidate, then drop everything
+    # closer than the separation to it in one vectorised sweep.
+    while remaining.size and len(chosen) < count:
+        best = int(remaining[0])
+        chosen.append((float(lats[best]), float(lons[best]), float(candidates.score[best])))
+        rest = remaining[1:]
+        separation = haversine_m_array(lats[rest], lons[rest], lats[best], lons[best], cos_lats[rest])
+        remaining = rest[separation >= min_separation_m]
     return chosen
 
 
-def ensure_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
-
-
 def main() -> None:
     parser = argparse.ArgumentParser(description="Score OSRM route alternatives using scenic edge scores")
     parser.add_argument("--origin-lat", type=float, required=True, help="Origin latitude")
@@ -572,6 +1366,12 @@ def main() -> None:
         default=1500.0,
         help="Minimum separation (m) between waypoints (default: 1500)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent OSRM route requests (default: 8; 1 = sequential)",
+    )
     parser.add_argument(
         "--cache-dir",
         type=str,
@@ -597,42 +1397,44 @@ def main() -> None:
     dest   = (args.dest_lat,   args.dest_lon)
 
     # Prefer the densified heatmap for scenic lookups, fall back to road midpoints.
-    scoring_candidates: List[Tuple[float, float, float]] = []
+    scoring_candidates: Optional[ScenicPoints] = None
     scenic_source = None
-    heatmap_points: List[Tuple[float, float, float]] = []
 
     if args.heatmap:
         heatmap_path = Path(args.heatmap)
         if heatmap_path.exists():
             heatmap_points = load_heatmap(heatmap_path)
             if heatmap_points:
-                scoring_candidates = heatmap_points
+                scoring_candidates = ScenicPoints.from_points(heatmap_points)
                 scenic_source = "heatmap"
             else:
                 print(f"Heatmap file {args.heatmap} contained no scenic points; falling back to edge midpoints.")
         else:
             print(f"Heatmap file {args.heatmap} not found; falling back to edge midpoints.")
 
-    if not scoring_candidates:
+    if scoring_candidates is None:
         if not args.edge_scores:
             raise SystemExit("No scenic data available. Provide --heatmap or --edge-scores.")
         edge_features = load_edge_scores(args.edge_scores)
         scoring_candidates = build_road_midpoints(edge_features)
         scenic_source = "edge_midpoints"
-        if not scoring_candidates:
+        if not len(scoring_candidates):
             raise SystemExit("No scenic data available. Ensure step 6 generated edge scores or a heatmap.")
 
     road_weighting_applied = False
-    dead_end_grid = None
-    dead_end_cell_deg = 0.002
+    dead_end_index: Optional[PointIndex] = None
     if args.roads:
         roads_path = Path(args.roads)
         if roads_path.exists():
-            road_features = load_roads(str(roads_path))
-            if road_features:
+            road_index = load_road_index(
+                roads_path,
+                args.road_sample_step,
+                cache_dir=None if args.no_cache else Path(args.cache_dir),
+            )
+            if road_index.feature_count:
                 if not args.no_road_weighting and scenic_source == "heatmap":
-                    anchors = build_road_anchors(road_features, args.road_sample_step)
-                    if anchors:
+                    anchors = road_index.anchors
+                    if len(anchors):
                         scoring_candidates = apply_road_weighting(
                             scoring_candidates,
                             anchors,
@@ -641,39 +1443,84 @@ def main() -> None:
                         )
                         road_weighting_applied = True
                 if not args.no_dead_end_filter:
-                    dead_ends = build_dead_end_nodes(road_features)
-                    if dead_ends:
-                        dead_end_grid = build_grid_index(dead_ends, dead_end_cell_deg)
+                    dead_ends = road_index.dead_ends
+                    if len(dead_ends):
+                        dead_end_index = PointIndex(dead_ends[:, 0], dead_ends[:, 1], cell_deg=0.002)
                         print(f"Dead-end filter enabled ({len(dead_ends)} dead-end nodes).")
             else:
                 print(f"Roads file {args.roads} contained no features; skipping road weighting.")
         else:
             print(f"Roads file {args.roads} not found; skipping road weighting.")
 
+    # Candidate trigonometry is shared by every route scored below.
+    scenic_index = ScenicIndex.from_points(scoring_candidates)
+
     # Query OSRM for route alternatives
     cache: Optional[DiskCache] = None
     if not args.no_cache:
         ttl = args.cache_ttl if args.cache_ttl > 0 else None
         cache = DiskCache(Path(args.cache_dir), namespace="osrm", max_age=ttl)
 
-    try:
-        def _request(coords: List[Tuple[float, float]], extra: Optional[Dict[str, str]] = None) -> dict:
-            return query_osrm(coords, args.endpoint, extra_params=extra)
-
-        base_coords = [origin, dest]
-        if cache:
-            request_key = DiskCache.key_from_mapping(
-                {
-                    "coords": [(round(lat, 6), round(lon, 6)) for lat, lon in base_coords],
-                    "endpoint": args.endpoint,
-                    "alternatives": "true",
-                }
-            )
-            routes_data = cache.get_or_create(request_key, lambda: _request(base_coords))
-        else:
-            routes_data = _request(base_coords)
-    except Exception as exc:
-        raise SystemExit(f"Failed to query OSRM: {exc}")
+    # One keep-alive session (sized for the request thread pool) serves every
+    # OSRM call of the run.
+    session = build_session(
+        retries=3, backoff_factor=0.5, allowed_methods=("GET",), pool_size=max(1, args.concurrency)
+    )
+
+    # The OSRM URL layout is fixed for the run; only the coordinates vary.
+    route_url = make_osrm_formatter(args.endpoint, extra_params=osrm_params())
+    waypoint_url = make_osrm_formatter(args.endpoint, extra_params=osrm_params({"alternatives": "false"}))
+
+    def _request(
+        coords: List[Tuple[float, float]], url_formatter: Callable[[List[Tuple[float, float]]], str]
+    ) -> dict:
+        return query_osrm(coords, args.endpoint, session=session, url_formatter=url_formatter)
+
+    def _cached_request(coords: List[Tuple[float, float]], alternatives: bool) -> dict:
+        url_formatter = route_url if alternatives else waypoint_url
+        if not cache:
+            return _request(coords, url_formatter)
+        request_key = DiskCache.key_from_mapping(
+            {
+                "coords": [(round(lat, 6), round(lon, 6)) for lat, lon in coords],
+                "endpoint": args.endpoint,
+                "alternatives": "true" if alternatives else "false",
+            }
+        )
+        return cache.get_or_create(request_key, lambda: _request(coords, url_formatter))
+
+    def _fetch(job: Tuple[List[Tuple[float, float]], bool]) -> Union[dict, Exception]:
+        try:
+            return _cached_request(*job)
+        except Exception as exc:
+            return exc
+
+    # Waypoints depend only on the candidates and endpoints, not on the
+    # alternatives response, so they are chosen before any request is made.
+    waypoint_candidates: List[Tuple[float, float, float]] = []
+    if args.waypoint_count > 0 and len(scoring_candidates):
+        waypoint_candidates = select_waypoints(
+            scoring_candidates,
+            origin,
+            dest,
+            count=args.waypoint_count,
+            radius_m=args.waypoint_radius,
+            min_distance_m=args.waypoint_min_distance,
+            min_separation_m=args.waypoint_min_separation,
+            dead_end_index=dead_end_index,
+            dead_end_radius_m=args.dead_end_radius,
+        )
+
+    # The alternatives request and every waypoint request are independent and
+    # network bound, so they go out together, up to --concurrency at a time;
+    # results come back in submission order with the alternatives first.
+    jobs = [([origin, dest], True)]
+    jobs.extend(([origin, (w_lat, w_lon), dest], False) for w_lat, w_lon, _ in waypoint_candidates)
+    results = concurrent_map(_fetch, jobs, args.concurrency)
+
+    routes_data = next(results)
+    if isinstance(routes_data, Exception):
+        raise SystemExit(f"Failed to query OSRM: {routes_data}")
 
     routes = routes_data.get("routes", [])
     if not routes:
@@ -682,19 +1529,42 @@ def main() -> None:
     durations = [r.get("duration") for r in routes if r.get("duration") is not None]
     shortest_duration = min(durations) if durations else None
 
-    features = []
+    max_dist = None
+    if scenic_source == "heatmap" and args.max_heatmap_distance > 0:
+        max_dist = args.max_heatmap_distance
+
+    # (route, samples, properties that follow the shared ones) per candidate
+    # route; all of them are scored together once the waypoint routes are in.
+    pending: List[Tuple[dict, np.ndarray, Union[int, str], Dict]] = []
     for i, route in enumerate(routes):
-        geometry = route.get("geometry", {})
-        coords = geometry.get("coordinates", [])
+        coords = route.get("geometry", {}).get("coordinates", [])
         if not coords:
             continue
+        extra = {"road_weighting": road_weighting_applied, "route_variant": "osrm_alternative"}
+        pending.append((route, densify_route(coords, args.step), i, extra))
+
+    if waypoint_candidates:
+        for idx, ((w_lat, w_lon, w_score), waypoint_data) in enumerate(zip(waypoint_candidates, results), start=1):
+            if isinstance(waypoint_data, Exception):
+                continue
 
-        # Sample along route and compute scenic mean
-        samples = densify_route(coords, args.step)
-        max_dist = None
-        if scenic_source == "heatmap" and args.max_heatmap_distance > 0:
-            max_dist = args.max_heatmap_distance
-        scenic_stats = compute_route_scenic(samples, scoring_candidates, max_distance=max_dist)
+            wp_routes = waypoint_data.get("routes", []) or []
+            for route in wp_routes:
+                coords = route.get("geometry", {}).get("coordinates", [])
+                if not coords:
+                    continue
+                extra = {
+                    "route_variant": "waypoint",
+                    "waypoint_lat": w_lat,
+                    "waypoint_lon": w_lon,
+                    "waypoint_score": w_score,
+                }
+                pending.append((route, densify_route(coords, args.step), f"waypoint_{idx}", extra))
+
+    all_stats = compute_routes_scenic([samples for _, samples, _, _ in pending], scenic_index, max_distance=max_dist)
+
+    features = []
+    for (route, samples, route_index, extra), scenic_stats in zip(pending, all_stats):
         mean_score = (scenic_stats or {}).get("mean")
         coverage = (scenic_stats or {}).get("coverage")
         effective_score = None
@@ -702,7 +1572,7 @@ def main() -> None:
             effective_score = mean_score * coverage
 
         props = {
-            "route_index": i,
+            "route_index": route_index,
             "duration": route.get("duration"),
             "distance": route.get("distance"),
             "scenic_score": mean_score,
@@ -713,9 +1583,8 @@ def main() -> None:
             "scenic_total_samples": len(samples),
             "scenic_avg_lookup_distance": (scenic_stats or {}).get("avg_lookup_distance"),
             "scenic_weight": scenic_weight,
-            "road_weighting": road_weighting_applied,
-            "route_variant": "osrm_alternative",
         }
+        props.update(extra)
         if shortest_duration and props.get("duration") is not None:
             props["duration_ratio"] = props["duration"] / shortest_duration
         else:
@@ -724,89 +1593,11 @@ def main() -> None:
         features.append(
             {
                 "type": "Feature",
-                "geometry": geometry,  # already GeoJSON from OSRM (geometries=geojson)
+                "geometry": route.get("geometry", {}),  # already GeoJSON from OSRM (geometries=geojson)
                 "properties": props,
             }
         )
 
-    if args.waypoint_count > 0 and scoring_candidates:
-        waypoint_candidates = select_waypoints(
-            scoring_candidates,
-            origin,
-            dest,
-            count=args.waypoint_count,
-            radius_m=args.waypoint_radius,
-            min_distance_m=args.waypoint_min_distance,
-            min_separation_m=args.waypoint_min_separation,
-            dead_end_grid=dead_end_grid,
-            dead_end_cell_deg=dead_end_cell_deg,
-            dead_end_radius_m=args.dead_end_radius,
-        )
-        for idx, (w_lat, w_lon, w_score) in enumerate(waypoint_candidates, start=1):
-            waypoint_coords = [origin, (w_lat, w_lon), dest]
-            try:
-                if cache:
-                    request_key = DiskCache.key_from_mapping(
-                        {
-                            "coords": [(round(lat, 6), round(lon, 6)) for lat, lon in waypoint_coords],
-                            "endpoint": args.endpoint,
-                            "alternatives": "false",
-                        }
-                    )
-                    waypoint_data = cache.get_or_create(request_key, lambda: _request(waypoint_coords, {"alternatives": "false"}))
-                else:
-                    waypoint_data = _request(waypoint_coords, {"alternatives": "false"})
-            except Exception:
-                continue
-
-            wp_routes = waypoint_data.get("routes", []) or []
-            for route in wp_routes:
-                geometry = route.get("geometry", {})
-                coords = geometry.get("coordinates", [])
-                if not coords:
-                    continue
-                samples = densify_route(coords, args.step)
-                max_dist = None
-                if scenic_source == "heatmap" and args.max_heatmap_distance > 0:
-                    max_dist = args.max_heatmap_distance
-                scenic_stats = compute_route_scenic(samples, scoring_candidates, max_distance=max_dist)
-                mean_score = (scenic_stats or {}).get("mean")
-                coverage = (scenic_stats or {}).get("coverage")
-                effective_score = None
-                if mean_score is not None and coverage is not None:
-                    effective_score = mean_score * coverage
-
-                props = {
-                    "route_index": f"waypoint_{idx}",
-                    "duration": route.get("duration"),
-                    "distance": route.get("distance"),
-                    "scenic_score": mean_score,
-                    "scenic_effective_score": effective_score,
-                    "scenic_source": scenic_source,
-                    "scenic_coverage": coverage or 0.0,
-                    "scenic_sampled_points": (scenic_stats or {}).get("sampled_points", 0),
-                    "scenic_total_samples": len(samples),
-                    "scenic_avg_lookup_distance": (scenic_stats or {}).get("avg_lookup_distance"),
-                    "scenic_weight": scenic_weight,
-                    "route_variant": "waypoint",
-                    "waypoint_lat": w_lat,
-                    "waypoint_lon": w_lon,
-                    "waypoint_score": w_score,
-                }
-                if shortest_duration and props.get("duration") is not None:
-                    props["duration_ratio"] = props["duration"] / shortest_duration
-                else:
-                    props["duration_ratio"] = None
-                props["max_duration_ratio"] = args.max_duration_ratio
-
-                features.append(
-                    {
-                        "type": "Feature",
-                        "geometry": geometry,
-                        "properties": props,
-                    }
-                )
-
     scored_routes = [
         feat for feat in features if feat.get("properties", {}).get("scenic_effective_score") is not None
     ]
@@ -868,8 +1659,7 @@ def main() -> None:
     # Write output
     out = {"type": "FeatureCollection", "features": features}
     ensure_dir(args.output)
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(out, f)
+    write_json(args.output, out)
     print(f"Wrote {len(features)} routes with scenic scores to {args.output}")
 
 if __name__ == "__main__":
@@ -12,10 +12,11 @@ import json
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from natura.io import load_geojson as read_geojson
+
 
 def load_geojson(path: Path) -> Dict:
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_geojson(path)
 
 
 def summarize_points(points: List[Tuple[float, float, Optional[float]]]) -> Dict[str, Optional[float]]:
@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from natura.io import load_geojson as read_geojson
+
 
 def load_csv(path: Path) -> List[Dict[str, str]]:
     if not path.exists():
@@ -25,8 +27,7 @@ def load_csv(path: Path) -> List[Dict[str, str]]:
 def load_geojson(path: Path) -> Dict:
     if not path.exists():
         return {}
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_geojson(path)
 
 
 def to_float(value: Optional[str]) -> Optional[float]:
@@ -13,13 +13,15 @@ can adopt it without introducing third-party dependencies such as
 
 from __future__ import annotations
 
+import gzip
 import hashlib
 import json
 import os
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
 
 CacheFactory = Callable[[], Any]
@@ -29,10 +31,10 @@ def _ensure_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def _serialise(value: Any) -> str:
+def _serialise(value: Any, created: Optional[float] = None) -> str:
     return json.dumps(
         {
-            "created": time.time(),
+            "created": time.time() if created is None else created,
             "payload": value,
         },
         ensure_ascii=False,
@@ -53,6 +55,7 @@ class DiskCache:
     root: Path
     namespace: str = "default"
     max_age: Optional[float] = None  # seconds; None means no expiry
+    compress: bool = False  # gzip entries; worthwhile for large payloads
 
     def __post_init__(self) -> None:
         self.root = Path(self.root)
@@ -63,7 +66,8 @@ class DiskCache:
         return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
     def _path(self, key: str) -> Path:
-        return self.cache_dir / f"{self._hash_key(key)}.json"
+        suffix = ".json.gz" if self.compress else ".json"
+        return self.cache_dir / f"{self._hash_key(key)}{suffix}"
 
     @staticmethod
     def key_from_mapping(mapping: Any) -> str:
@@ -83,17 +87,40 @@ class DiskCache:
                     pass
                 return None
         try:
-            raw = path.read_text(encoding="utf-8")
-        except OSError:
+            if self.compress:
+                raw = gzip.decompress(path.read_bytes()).decode("utf-8")
+            else:
+                raw = path.read_text(encoding="utf-8")
+        except (OSError, EOFError):
             return None
         payload, _created = _deserialise(raw)
         return payload
 
+    def _write(self, path: Path, payload: bytes) -> None:
+        if self.compress:
+            payload = gzip.compress(payload)
+        # Write to a private temp file and rename it into place so concurrent
+        # writers (threads or processes) never leave a torn entry behind.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+
     def save(self, key: str, value: Any) -> None:
         path = self._path(key)
         _ensure_dir(path)
-        payload = _serialise(value)
-        path.write_text(payload, encoding="utf-8")
+        self._write(path, _serialise(value).encode("utf-8"))
+
+    def save_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store several entries in one pass.
+
+        The cache directory is created once and every entry shares a single
+        timestamp; each entry is still its own file so :meth:`load` is
+        unchanged.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        created = time.time()
+        for key, value in items:
+            self._write(self._path(key), _serialise(value, created).encode("utf-8"))
 
     def get_or_create(self, key: str, factory: CacheFactory) -> Any:
         cached = self.load(key)
@@ -103,3 +130,55 @@ class DiskCache:
         self.save(key, value)
         return value
 
+
+class BufferedCache:
+    """Write-behind wrapper that batches :meth:`DiskCache.save` calls.
+
+    Saved entries are held in memory (and served by :meth:`load`) until
+    ``max_pending`` have accumulated, then written together with
+    :meth:`DiskCache.save_many`.  Safe to share between threads; call
+    :meth:`flush` (or use it as a context manager) before exiting so the
+    tail of the buffer reaches disk.
+    """
+
+    def __init__(self, cache: DiskCache, max_pending: int = 256) -> None:
+        self.cache = cache
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "BufferedCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.flush()
+
+    key_from_mapping = staticmethod(DiskCache.key_from_mapping)
+
+    def load(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+        return self.cache.load(key)
+
+    def save(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._pending[key] = value
+            if len(self._pending) < self.max_pending:
+                return
+            batch, self._pending = self._pending, {}
+        self.cache.save_many(batch.items())
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if batch:
+            self.cache.save_many(batch.items())
+
+    def get_or_create(self, key: str, factory: CacheFactory) -> Any:
+        cached = self.load(key)
+        if cached is not None:
+            return cached
+        value = factory()
+        self.save(key, value)
+        return value
@@ -5,7 +5,11 @@ Small collection of geographic helpers shared across the pipeline.
 from __future__ import annotations
 
 import math
-from typing import Iterable, Iterator, List, Sequence, Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ArrayLike = Union[float, np.ndarray]
 
 
 def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -20,6 +24,30 @@ def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * c
 
 
+def haversine_m_array(
+    lat1: ArrayLike,
+    lon1: ArrayLike,
+    lat2: ArrayLike,
+    lon2: ArrayLike,
+    cos_lat1: Optional[ArrayLike] = None,
+) -> np.ndarray:
+    """Vectorised :func:`haversine_m`; inputs broadcast against each other.
+
+    Pass ``cos_lat1`` (``np.cos(np.radians(lat1))``) when the same ``lat1``
+    array is measured against several points, so its trigonometry is done
+    once.
+    """
+    R = 6371000.0
+    if cos_lat1 is None:
+        cos_lat1 = np.cos(np.radians(lat1))
+    phi2 = np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi / 2) ** 2 + cos_lat1 * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
 def interpolate_linear(lat1: float, lon1: float, lat2: float, lon2: float, fraction: float) -> Tuple[float, float]:
     """Simple linear interpolation between two coordinates."""
     return lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction
@@ -58,3 +86,66 @@ def densify_linestring(coords: Sequence[Sequence[float]], step_m: float) -> List
             deduped.append(pt)
     return deduped
 
+
+
+def densify_linestrings(
+    lines: Sequence[Sequence[Sequence[float]]], step_m: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Apply :func:`densify_linestring` to many LineStrings at once.
+
+    Returns ``(lat, lon, line)`` arrays where ``line`` is the index into
+    ``lines`` each point belongs to; points come out in the same order the
+    per-line function yields them.  All segments of all lines are handled in
+    one set of array operations, which beats calling the scalar function per
+    line once there are more than a handful of lines.
+    """
+    if step_m <= 0:
+        raise ValueError("step_m must be > 0")
+    counts = np.array([len(coords) for coords in lines], dtype=np.intp)
+    if not counts.sum():
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, np.empty(0, dtype=np.intp)
+    arr = np.asarray([pt[:2] for coords in lines for pt in coords], dtype=np.float64)
+    lon = arr[:, 0]
+    lat = arr[:, 1]
+    vertex_line = np.repeat(np.arange(len(lines)), counts)
+    firsts = (np.cumsum(counts) - counts)[counts > 0]
+
+    # Segments join consecutive vertices of one line; zero-length ones add
+    # nothing, not even their end vertex.
+    segment_len = haversine_m_array(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    seg = np.flatnonzero((vertex_line[:-1] == vertex_line[1:]) & (segment_len > 0))
+    seg_len = segment_len[seg]
+    steps = np.maximum(1, (seg_len // step_m).astype(np.intp))
+    interior = steps - (steps * step_m >= seg_len)
+
+    # Output blocks: each line's first vertex, then per segment its interior
+    # points and end vertex, ordered by the vertex they start at.
+    block_vertex = np.concatenate((firsts, seg))
+    block_size = np.concatenate((np.ones(firsts.shape[0], dtype=np.intp), interior + 1))
+    order = np.argsort(2 * block_vertex + (np.arange(block_vertex.shape[0]) >= firsts.shape[0]), kind="stable")
+    block_vertex = block_vertex[order]
+    block_size = block_size[order]
+    block_end = np.cumsum(block_size)
+    is_head = order < firsts.shape[0]
+    host = np.repeat(block_vertex, block_size)
+    k = np.arange(block_end[-1]) - np.repeat(block_end - block_size, block_size) + 1
+    out_lat = np.empty(host.shape[0])
+    out_lon = np.empty(host.shape[0])
+    on_seg = ~np.repeat(is_head, block_size)
+    h = host[on_seg]
+    fraction = k[on_seg] * step_m / segment_len[h]
+    out_lat[on_seg] = lat[h] + (lat[h + 1] - lat[h]) * fraction
+    out_lon[on_seg] = lon[h] + (lon[h + 1] - lon[h]) * fraction
+    head_pos = block_end[is_head] - 1
+    out_lat[head_pos] = lat[block_vertex[is_head]]
+    out_lon[head_pos] = lon[block_vertex[is_head]]
+    end_pos = block_end[~is_head] - 1
+    out_lat[end_pos] = lat[block_vertex[~is_head] + 1]
+    out_lon[end_pos] = lon[block_vertex[~is_head] + 1]
+
+    # Drop consecutive duplicates within a line, as the scalar version does.
+    keep = np.ones(out_lat.shape[0], dtype=bool)
+    keep[1:] = (out_lat[1:] != out_lat[:-1]) | (out_lon[1:] != out_lon[:-1])
+    keep[head_pos] = True
+    return out_lat[keep], out_lon[keep], vertex_line[host][keep]
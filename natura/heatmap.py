@@ -13,14 +13,24 @@ import json
 from pathlib import Path
 from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
 
-from .geo import densify_linestring
+from .geo import densify_linestrings
+from .io import iter_geojson_features
+
+# Scored edges densified per vectorised batch in :func:`iter_heatmap_points`.
+HEATMAP_EDGE_BATCH = 4096
 
 
 def iter_heatmap_points(
     edges_geojson: Dict,
     step_m: float = 75.0,
 ) -> Iterator[Tuple[float, float, float]]:
-    """Yield (lat, lon, score) tuples along each scored edge."""
+    """Yield (lat, lon, score) tuples along each scored edge.
+
+    Edges are densified ``HEATMAP_EDGE_BATCH`` at a time with
+    :func:`densify_linestrings`; points come out in edge order.
+    """
+    lines: List[Sequence[Sequence[float]]] = []
+    scores: List[float] = []
     for feature in edges_geojson.get("features", []):
         geometry = feature.get("geometry") or {}
         if geometry.get("type") != "LineString":
@@ -31,8 +41,21 @@ def iter_heatmap_points(
         coords = geometry.get("coordinates") or []
         if not coords:
             continue
-        for lat, lon in densify_linestring(coords, step_m):
-            yield lat, lon, float(score)
+        lines.append(coords)
+        scores.append(float(score))
+        if len(lines) >= HEATMAP_EDGE_BATCH:
+            yield from _densify_scored(lines, scores, step_m)
+            lines, scores = [], []
+    if lines:
+        yield from _densify_scored(lines, scores, step_m)
+
+
+def _densify_scored(
+    lines: List[Sequence[Sequence[float]]], scores: List[float], step_m: float
+) -> Iterator[Tuple[float, float, float]]:
+    lat, lon, line = densify_linestrings(lines, step_m)
+    point_scores = [scores[i] for i in line.tolist()]
+    return zip(lat.tolist(), lon.tolist(), point_scores)
 
 
 def heatmap_feature_collection(points: Iterable[Tuple[float, float, float]]) -> Dict:
@@ -57,12 +80,13 @@ def write_heatmap(points: Iterable[Tuple[float, float, float]], path: Path) -> N
 
 
 def load_heatmap(path: Path) -> List[Tuple[float, float, float]]:
-    """Read a GeoJSON heatmap file created by :func:`write_heatmap`."""
-    path = Path(path)
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    """Read a GeoJSON heatmap file created by :func:`write_heatmap`.
+
+    Parsed with :func:`natura.io.iter_geojson_features`, so the fast JSON
+    backends and newline-delimited or FlatGeobuf files are supported too.
+    """
     points: List[Tuple[float, float, float]] = []
-    for feature in data.get("features", []):
+    for feature in iter_geojson_features(path):
         geometry = feature.get("geometry") or {}
         if geometry.get("type") != "Point":
             continue
@@ -0,0 +1,79 @@
+"""
+Shared HTTP session and concurrency helpers.
+
+Every external service used by the pipeline (Overpass, Mapillary, Google
+Street View, OSRM) is called many times per run.  Reusing one
+``requests.Session`` keeps TCP/TLS connections alive between calls, and
+mounting an ``HTTPAdapter`` with a ``urllib3`` ``Retry`` policy retries rate
+limited (429) and transient gateway errors with exponential backoff instead
+of failing the whole step.
+
+The per-item work in the metadata and image download steps is network
+bound, so :func:`concurrent_map` runs it in a thread pool that shares one
+such session while keeping results in input order.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Mapping, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def build_session(
+    retries: int = 5,
+    backoff_factor: float = 1.0,
+    status_forcelist: Iterable[int] = DEFAULT_RETRY_STATUSES,
+    allowed_methods: Iterable[str] = ("GET", "POST"),
+    headers: Optional[Mapping[str, str]] = None,
+    pool_size: int = 10,
+) -> requests.Session:
+    """Create a keep-alive session that retries transient failures.
+
+    ``pool_size`` bounds the keep-alive connections per host; it should be at
+    least the number of threads sharing the session.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=tuple(status_forcelist),
+        allowed_methods=frozenset(m.upper() for m in allowed_methods),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def concurrent_map(func: Callable[[T], R], items: Iterable[T], concurrency: int = 1) -> Iterator[R]:
+    """Yield ``func(item)`` for every item, in input order.
+
+    With ``concurrency`` > 1 up to that many calls run at once in a thread
+    pool; items are submitted in bounded batches so the number of pending
+    futures stays small even for very long inputs.
+    """
+    if concurrency <= 1:
+        yield from map(func, items)
+        return
+    it = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            batch = list(islice(it, concurrency * 16))
+            if not batch:
+                break
+            yield from pool.map(func, batch)
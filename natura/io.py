@@ -0,0 +1,408 @@
+"""
+JSON I/O helpers for pipeline GeoJSON files.
+
+Road, sample and grid GeoJSON files can grow to hundreds of megabytes, which
+makes parsing and serialisation a noticeable share of every stage's runtime.
+These helpers use ``orjson`` when it is installed, then ``ujson``, and fall
+back to the standard library ``json`` module so the scripts keep working
+without any extra dependency.
+
+Feature streams may also be written as newline-delimited GeoJSON (one
+Feature per line, a.k.a. GeoJSONSeq).  Producers can then emit features as
+they are generated and consumers can parse them one line at a time; the
+readers below accept either layout transparently.
+
+When ``pyogrio`` is installed, intermediates can also be stored as
+FlatGeobuf, a binary format with a built-in spatial index that needs no text
+parsing.  The readers detect FlatGeobuf files by their magic bytes, so
+downstream steps accept all three layouts without extra flags.
+
+:func:`read_csv_columns` reads selected columns of the metadata and score
+CSVs, using ``pandas``' C parser when it is installed.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import struct
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import ujson
+except ImportError:  # optional dependency
+    ujson = None  # type: ignore[assignment]
+
+try:
+    import pyogrio
+    from pyogrio import raw as pyogrio_raw
+except ImportError:  # optional dependency
+    pyogrio = None  # type: ignore[assignment]
+    pyogrio_raw = None  # type: ignore[assignment]
+
+
+PathLike = Union[str, Path]
+
+OUTPUT_FORMATS = ("geojson", "ndjson", "fgb")
+
+_FGB_MAGIC = b"fgb"
+
+
+def ensure_dir(path: PathLike) -> None:
+    """Create the parent directory of ``path`` if it does not exist yet."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse a JSON document from bytes or text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialise ``obj`` to UTF-8 encoded JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    if ujson is not None:
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def load_json(path: PathLike) -> Any:
+    """Read and parse a JSON (or GeoJSON) file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(path: PathLike, obj: Any) -> None:
+    """Serialise ``obj`` and write it to ``path``."""
+    with open(path, "wb") as f:
+        f.write(dumps(obj))
+
+
+def read_csv_columns(path: PathLike, names: Sequence[str]) -> Dict[str, List[Optional[str]]]:
+    """Read the named columns of a CSV file as lists of strings.
+
+    Cells behave like ``csv.DictReader`` values: a column missing from the
+    header, or a field missing from a short row, reads as ``None`` and blank
+    lines are skipped.  No values are converted, so callers keep their own
+    parsing rules.
+    """
+    # Imported lazily: pandas is slow to import and only this helper uses it.
+    try:
+        import pandas as pd
+    except ImportError:  # optional dependency
+        pd = None
+    if pd is not None:
+        try:
+            frame = pd.read_csv(
+                path,
+                dtype=str,
+                keep_default_na=False,
+                usecols=lambda column: column in names,
+                encoding="utf-8",
+            )
+        except pd.errors.EmptyDataError:
+            return {name: [] for name in names}
+        return {
+            name: (
+                [value if isinstance(value, str) else None for value in frame[name].tolist()]
+                if name in frame.columns
+                else [None] * len(frame)
+            )
+            for name in names
+        }
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = [header.index(name) if name in header else None for name in names]
+        width = max((col for col in columns if col is not None), default=-1) + 1
+        pad: List[Optional[str]] = [None] * width
+        rows: List[List[Optional[str]]] = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row = row + pad[len(row):]
+            rows.append(row)
+    return {
+        name: [row[col] for row in rows] if col is not None else [None] * len(rows)
+        for name, col in zip(names, columns)
+    }
+
+
+_LINE_STRIP = b"\x1e \t\r\n"
+
+
+def _read_document_or_first_feature(f: BinaryIO) -> Dict:
+    """Parse the first line of ``f``; fall back to the whole document.
+
+    For newline-delimited input the first Feature is returned and the file
+    position is left at the start of the second line.  Otherwise the whole
+    file is parsed and the resulting document returned.
+    """
+    first = f.readline()
+    head = first.strip(_LINE_STRIP)
+    if head:
+        try:
+            obj = loads(head)
+        except ValueError:
+            obj = None
+        if isinstance(obj, dict):
+            return obj
+    return loads(first + f.read()) or {}
+
+
+def _iter_remaining_lines(f: BinaryIO) -> Iterator[Dict]:
+    for line in f:
+        line = line.strip(_LINE_STRIP)
+        if line:
+            yield loads(line)
+
+
+def _is_flatgeobuf(path: PathLike) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(_FGB_MAGIC)) == _FGB_MAGIC
+
+
+def iter_geojson_features(path: PathLike) -> Iterator[Dict]:
+    """Yield features from a FeatureCollection, newline-delimited GeoJSON or
+    FlatGeobuf file.
+
+    Newline-delimited files are parsed one line at a time so memory use stays
+    flat regardless of file size.
+    """
+    if _is_flatgeobuf(path):
+        yield from read_flatgeobuf(path)
+        return
+    with open(path, "rb") as f:
+        obj = _read_document_or_first_feature(f)
+        if obj.get("type") == "Feature":
+            yield obj
+            yield from _iter_remaining_lines(f)
+            return
+    yield from obj.get("features", [])
+
+
+def load_geojson(path: PathLike) -> Dict:
+    """Load a GeoJSON FeatureCollection, accepting newline-delimited and
+    FlatGeobuf input too."""
+    if _is_flatgeobuf(path):
+        return {"type": "FeatureCollection", "features": read_flatgeobuf(path)}
+    with open(path, "rb") as f:
+        obj = _read_document_or_first_feature(f)
+        if obj.get("type") != "Feature":
+            return obj
+        features = [obj]
+        features.extend(_iter_remaining_lines(f))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def write_feature_collection(path: PathLike, features: Iterable[Any]) -> int:
+    """Stream features into a FeatureCollection file; returns the count.
+
+    The collection envelope is written by hand around each serialised
+    feature, so the full feature list never has to exist in memory.
+    """
+    count = 0
+    with open(path, "wb") as f:
+        f.write(b'{"type":"FeatureCollection","features":[')
+        for feature in features:
+            if count:
+                f.write(b",")
+            f.write(dumps(feature))
+            count += 1
+        f.write(b"]}")
+    return count
+
+
+def write_ndjson(path: PathLike, features: Iterable[Any]) -> int:
+    """Write one JSON document per line and return the number written."""
+    count = 0
+    with open(path, "wb") as f:
+        for feature in features:
+            f.write(dumps(feature))
+            f.write(b"\n")
+            count += 1
+    return count
+
+
+# -- FlatGeobuf ---------------------------------------------------------------
+#
+# pyogrio exchanges geometries as WKB.  The pipeline only produces Points and
+# LineStrings, so they are packed and unpacked here directly instead of
+# pulling in shapely.
+
+_WKB_POINT = 1
+_WKB_LINESTRING = 2
+
+
+def _geometry_to_wkb(geometry: Dict) -> bytes:
+    gtype = geometry.get("type")
+    coords = geometry.get("coordinates")
+    if gtype == "Point":
+        return struct.pack("<BIdd", 1, _WKB_POINT, float(coords[0]), float(coords[1]))
+    if gtype == "LineString":
+        xy = np.asarray(coords, dtype="<f8")[:, :2]
+        return struct.pack("<BII", 1, _WKB_LINESTRING, xy.shape[0]) + xy.tobytes()
+    raise ValueError(f"Unsupported geometry type for FlatGeobuf output: {gtype}")
+
+
+def _wkb_to_geometry(wkb: bytes) -> Dict:
+    order = "<" if wkb[0] == 1 else ">"
+    (gtype,) = struct.unpack_from(order + "I", wkb, 1)
+    gtype &= 0xFF  # drop Z/M/SRID flag bits
+    if gtype == _WKB_POINT:
+        x, y = struct.unpack_from(order + "dd", wkb, 5)
+        return {"type": "Point", "coordinates": [x, y]}
+    if gtype == _WKB_LINESTRING:
+        (n,) = struct.unpack_from(order + "I", wkb, 5)
+        xy = np.frombuffer(wkb, dtype=order + "f8", count=2 * n, offset=9).reshape(n, 2)
+        return {"type": "LineString", "coordinates": xy.tolist()}
+    raise ValueError(f"Unsupported WKB geometry type: {gtype}")
+
+
+# Layer metadata key listing the fields written as JSON text, so only those
+# are decoded again on read.
+_JSON_FIELDS_KEY = "NATURA_JSON_FIELDS"
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _property_column(values: List[Any]) -> Tuple[np.ndarray, Optional[np.ndarray], bool]:
+    """Pick the narrowest OGR-friendly dtype for one property column.
+
+    Returns the column, its null mask (``None`` when nothing is missing) and
+    whether it holds JSON text.  Integer and float columns stay numeric with
+    ``None`` written as null; a column with any nested value (e.g. OSM
+    ``tags``) stores every value as JSON text so it decodes back exactly.
+    """
+    present = [v for v in values if v is not None]
+    nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    mask = nulls if nulls.any() else None
+    if present and all(_is_number(v) and not isinstance(v, float) for v in present):
+        return np.asarray([0 if v is None else v for v in values], dtype=np.int64), mask, False
+    if present and all(_is_number(v) for v in present):
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64), mask, False
+    is_json = any(isinstance(v, (dict, list)) for v in present)
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        if v is None:
+            column[i] = None
+        elif is_json:
+            column[i] = dumps(v).decode("utf-8")
+        else:
+            column[i] = str(v)
+    return column, mask, is_json
+
+
+def _property_values(data: np.ndarray, dtype: str, is_json: bool) -> List[Any]:
+    """Turn one column read by pyogrio back into feature property values."""
+    if is_json:
+        return [None if v is None else loads(v) for v in data.tolist()]
+    if data.dtype.kind == "f":
+        # Integer columns with nulls come back as float64 with NaN.
+        nulls = np.isnan(data)
+        if np.dtype(dtype).kind == "i":
+            data = np.where(nulls, 0.0, data).astype(np.int64)
+        column = data.tolist()
+        for i in np.flatnonzero(nulls).tolist():
+            column[i] = None
+        return column
+    return np.asarray(data).tolist()
+
+
+def _require_pyogrio() -> None:
+    if pyogrio_raw is None:
+        raise RuntimeError("FlatGeobuf support requires pyogrio (pip install pyogrio)")
+
+
+def write_flatgeobuf(path: PathLike, features: Iterable[Dict]) -> int:
+    """Write Point or LineString features to a FlatGeobuf file; returns the count."""
+    _require_pyogrio()
+    geometries: List[bytes] = []
+    fields: List[str] = []
+    columns: Dict[str, List[Any]] = {}
+    geometry_type = None
+    for count, feature in enumerate(features):
+        geometry = feature.get("geometry") or {}
+        geometry_type = geometry_type or geometry.get("type")
+        geometries.append(_geometry_to_wkb(geometry))
+        props = feature.get("properties") or {}
+        for key in props:
+            if key not in columns:
+                fields.append(key)
+                columns[key] = [None] * count
+        for key in fields:
+            columns[key].append(props.get(key))
+    if not geometries:
+        raise ValueError("FlatGeobuf output needs at least one feature")
+    field_data: List[np.ndarray] = []
+    field_mask: List[Optional[np.ndarray]] = []
+    json_fields: List[str] = []
+    for key in fields:
+        column, mask, is_json = _property_column(columns[key])
+        field_data.append(column)
+        field_mask.append(mask)
+        if is_json:
+            json_fields.append(key)
+    pyogrio_raw.write(
+        str(path),
+        np.array(geometries, dtype=object),
+        field_data,
+        fields,
+        field_mask=field_mask if any(m is not None for m in field_mask) else None,
+        driver="FlatGeobuf",
+        geometry_type=geometry_type,
+        crs="EPSG:4326",
+        layer_metadata={_JSON_FIELDS_KEY: dumps(json_fields).decode("utf-8")} if json_fields else None,
+    )
+    return len(geometries)
+
+
+def read_flatgeobuf(path: PathLike) -> List[Dict]:
+    """Read a FlatGeobuf file back into a list of GeoJSON features."""
+    _require_pyogrio()
+    meta, _fids, geometries, field_data = pyogrio_raw.read(str(path))
+    layer_metadata = pyogrio.read_info(str(path)).get("layer_metadata") or {}
+    json_fields = set(loads(layer_metadata.get(_JSON_FIELDS_KEY, "[]")))
+    names = list(meta["fields"])
+    columns: List[Tuple[str, List[Any]]] = [
+        (name, _property_values(np.asarray(data), dtype, name in json_fields))
+        for name, data, dtype in zip(names, field_data, meta["dtypes"])
+    ]
+    features = []
+    for i, wkb in enumerate(geometries):
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": _wkb_to_geometry(bytes(wkb)),
+                "properties": {name: values[i] for name, values in columns},
+            }
+        )
+    return features
+
+
+def write_features(path: PathLike, features: Iterable[Dict], fmt: str = "geojson") -> int:
+    """Write features in one of :data:`OUTPUT_FORMATS`; returns the count."""
+    if fmt == "ndjson":
+        return write_ndjson(path, features)
+    if fmt == "fgb":
+        return write_flatgeobuf(path, features)
+    if fmt == "geojson":
+        return write_feature_collection(path, features)
+    raise ValueError(f"Unknown output format: {fmt}")